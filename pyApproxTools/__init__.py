@@ -1,6 +1,7 @@
 from pyApproxTools.basis import *
 from pyApproxTools.vector import *
 from pyApproxTools.greedy import *
+from pyApproxTools.shard import *
 from pyApproxTools.utils import *
 
 from pyApproxTools.pw_vector import *
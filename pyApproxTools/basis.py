@@ -35,6 +35,7 @@ class Basis(object):
     reconstruct(c)
     matrix_multiply(A)
     orthonormalise()
+    cross_validate(u, blocks)
     """
 
     def __init__(self, vecs=None, space='H1', is_orthonormal=False):
@@ -73,7 +74,7 @@ class Basis(object):
             if any(np.abs(v_dot) > 1e-13):
                 # We do a Gram-Schmidt style removal
                 for i, v in enumerate(self.vecs):
-                    vec = vec - v_dot[i] * v
+                    vec = vec.axpy(-v_dot[i], v)
                 n = vec.norm()
                 if n < 1e-13:
                     warnings.warn('{0}: tried adding linearly dependent vector to ortho basis, discarding...'.format(self.__class__.__name__))
@@ -103,6 +104,35 @@ class Basis(object):
         # Unfortunately there's no incremental SVD solution that I know of...
         self.U = self.V = self.S = None
 
+    def add_vectors(self, vecs, G_rows=None):
+        """ Add several vectors, padding the Grammian just the once. G_rows, the dots of the new vectors
+            against the whole of the extended basis (a row per new vector), can be given if the caller
+            already has them, and then no dot products are computed here """
+        if self.is_orthonormal or self.G is None:
+            for vec in vecs:
+                self.add_vector(vec)
+            return
+
+        # The vectors go in through add_vector (which inheritors may extend), with the Grammian set aside
+        n0 = self.n
+        G, self.G = self.G, None
+        for vec in vecs:
+            self.add_vector(vec)
+
+        if G_rows is None:
+            G_rows = np.zeros((self.n - n0, self.n))
+            for i in range(n0, self.n):
+                for j in range(i + 1):
+                    G_rows[i-n0, j] = self.vecs[i].dot(self.vecs[j])
+                    if j >= n0:
+                        G_rows[j-n0, i] = G_rows[i-n0, j]
+
+        self.G = np.pad(G, ((0, self.n - n0), (0, self.n - n0)), 'constant')
+        self.G[n0:, :] = G_rows
+        self.G[:, n0:] = np.transpose(G_rows)
+
+        self.orthonormal_basis = None
+
     def shuffle_vectors(self):
         random.shuffle(self.vecs)
         self.G = None
@@ -200,7 +230,7 @@ class Basis(object):
         u_p = type(self.vecs[0])()
         for i, c_i in enumerate(c):
             if c_i != 0:
-                u_p += c_i * self.vecs[i] 
+                u_p = u_p.axpy(c_i, self.vecs[i])
         return u_p
 
     def matrix_multiply(self, M):
@@ -229,6 +259,42 @@ class Basis(object):
         # In case this is an orthonormal basis
         return type(self)(vecs, space=self.space, is_orthonormal=True)
 
+    def grammian_inverse(self):
+        """ The inverse of the Grammian, built from the same Cholesky factor used by orthonormalise(),
+            i.e. G^-1 = L^-T L^-1 = L_inv L_inv^T """
+        if self.is_orthonormal:
+            return np.eye(self.n)
+
+        if self.G is None or self.L_inv is None or self.L_inv.shape[0] != self.n:
+            self.make_grammian()
+            G = self.G.toarray() if scipy.sparse.issparse(self.G) else self.G
+            L = np.linalg.cholesky(G)
+            self.L_inv = scipy.linalg.lapack.dtrtri(L.T)[0]
+        
+        return self.L_inv @ self.L_inv.T
+
+    def cross_validate(self, u, blocks=None):
+        r""" Leave-one-out (or leave-block-out) projection errors || u - P_{V \ K} u || for every
+            block K of basis indices. Instead of building a subspace_mask basis for each K, we downdate
+            the factorisation of the full problem: removing K from G c = b raises the squared 
+            projection error by c_K^T ((G^-1)_KK)^-1 c_K, so all n errors cost about as much as one fit.
+            blocks is a list of index arrays or boolean masks, and defaults to each vector on its own """
+        
+        G_inv = self.grammian_inverse()
+        b = self.dot(u)
+        c = G_inv @ b
+        err_sq = u.dot(u) - b @ c
+
+        if blocks is None:
+            loo_sq = err_sq + c * c / np.diag(G_inv)
+        else:
+            loo_sq = np.zeros(len(blocks))
+            for k, K in enumerate(blocks):
+                K = np.flatnonzero(K) if np.asarray(K).dtype == bool else np.asarray(K)
+                loo_sq[k] = err_sq + c[K] @ np.linalg.solve(G_inv[np.ix_(K, K)], c[K])
+
+        return np.sqrt(np.maximum(loo_sq, 0.0))
+
     def orthonormalise(self):
 
         if self.n == 0:
@@ -310,6 +376,37 @@ class BasisPair(object):
 
         self.U = self.V = self.S = None
 
+    def add_Vn_vectors(self, vs):
+        """ Add several vectors to Vn, padding the cross-grammian once """
+        n0 = self.n
+        self.Vn.add_vectors(vs)
+
+        if self.CG is not None:
+            CG_cols = np.zeros((self.m, self.n - n0))
+            for i in range(self.m):
+                for j in range(n0, self.n):
+                    CG_cols[i, j-n0] = self.Wm.vecs[i].dot(self.Vn.vecs[j])
+            self.CG = np.hstack((self.CG, CG_cols))
+
+        self.U = self.V = self.S = None
+
+    def add_Wm_vectors(self, ws, CG_rows=None):
+        """ Add several vectors to Wm, padding the cross-grammian once. CG_rows, the dots of the new elements
+            of Wm with Vn (a row each), can be given if the caller already has them. They are only used if
+            Wm gains as many elements, as an orthonormal Wm discards linearly dependent vectors """
+        m0 = self.m
+        self.Wm.add_vectors(ws)
+
+        if self.CG is not None:
+            if CG_rows is None or len(CG_rows) != self.m - m0:
+                CG_rows = np.zeros((self.m - m0, self.n))
+                for i in range(m0, self.m):
+                    for j in range(self.n):
+                        CG_rows[i-m0, j] = self.Vn.vecs[j].dot(self.Wm.vecs[i])
+            self.CG = np.vstack((self.CG, CG_rows))
+
+        self.U = self.V = self.S = None
+
     def subspace(self, Wm_indices=None, Vn_indices=None):
         if Wm_indices is None:
             Wm_indices = slice(0, self.m)
@@ -374,6 +471,45 @@ class BasisPair(object):
                                 S=self.S, U=np.eye(self.n), V=np.eye(self.m))
         return fb
 
+    def cross_validate(self, u, blocks=None):
+        r""" Leave-one-out (or leave-block-out) errors over the vectors of Vn. For each block K we 
+            return the projection error || u - P_{Vn \ K} u || and the error || u - u*_K || of the optimal
+            reconstruction from the measurements of u using Vn with K removed. 
+            
+            The normal equations M = CG^T CG are factorised once, and each removal is a downdate of 
+            that solution: c_K = c - (M^-1)_{:,K} ((M^-1)_KK)^-1 c_K, with the measurement residual 
+            growing by c_K^T ((M^-1)_KK)^-1 c_K. No subspaces, Grammians or SVDs are rebuilt. """
+        if self.Vn.n > self.Wm.n:
+            raise Exception('Error - Wm must be of higher dimensionality than Vn to be able to do optimal reconstruction')
+        if not self.Wm.is_orthonormal:
+            raise Exception('Wm must be orthonormal to cross validate the reconstruction!')
+        
+        self.Vn.make_grammian()
+        G_V = self.Vn.G.toarray() if scipy.sparse.issparse(self.Vn.G) else self.Vn.G
+
+        w = self.Wm.dot(u)
+        b = self.Vn.dot(u)
+        u_sq = u.dot(u)
+
+        M = self.CG.T @ self.CG
+        L_inv = scipy.linalg.lapack.dtrtri(np.linalg.cholesky(M).T)[0]
+        M_inv = L_inv @ L_inv.T
+        c = M_inv @ (self.CG.T @ w)
+        r_sq = w @ w - (self.CG.T @ w) @ c
+
+        if blocks is None:
+            blocks = [[j] for j in range(self.n)]
+        
+        recon_sq = np.zeros(len(blocks))
+        for k, K in enumerate(blocks):
+            K = np.flatnonzero(K) if np.asarray(K).dtype == bool else np.asarray(K)
+            y = np.linalg.solve(M_inv[np.ix_(K, K)], c[K])
+            c_K = c - M_inv[:, K] @ y
+            # || u - u* ||^2 = || (I - P_Wm)(u - v*) ||^2 = || u - v* ||^2 - || w - CG c ||^2
+            recon_sq[k] = (u_sq - 2.0 * c_K @ b + c_K @ G_V @ c_K) - (r_sq + c[K] @ y)
+        
+        return self.Vn.cross_validate(u, blocks), np.sqrt(np.maximum(recon_sq, 0.0))
+
     def measure_and_reconstruct(self, u, disp_cond=False):
         """ Just a little helper function. Not sure we really want this here """ 
         u_p_W = self.Wm.dot(u)
@@ -11,27 +11,247 @@ class "Vector", which has to have a dot product defined as well as typical linea
 This submodule defines a variety of greedy algorithms, using the basis class
 """
 
+import os
+import math
+import contextlib
+import heapq
 import numpy as np
+import scipy.linalg
+import scipy.optimize
 import copy
 import time
 import warnings
+try:
+    import resource
+except ImportError:
+    resource = None
 
 from pyApproxTools.vector import *
 from pyApproxTools.pw_vector import *
 from pyApproxTools.basis import *
 from pyApproxTools.pw_basis import *
+from pyApproxTools.shard import ShardPool, local_best
 
-__all__ = ['CollectiveOMP', 'WorstCaseOMP', 'WorstVecOMP', 'GreedyApprox', 'MeasBasedGreedy', 'MeasBasedOMP', 'MeasBasedPP']
+__all__ = ['CollectiveOMP', 'WorstCaseOMP', 'WorstVecOMP', 'GreedyApprox', 'MeasBasedGreedy', 'MeasBasedOMP', 'MeasBasedPP', 'MeasBasedBatchOMP', 'GreedyTrace', 'PivotedQRSelection']
 
 # This constant determines linear dependence in terms of max difference of norm (roughly sqrt machine tol)
 _LD_ATOL = 1e-8
 
-
-class GreedyMeasurement(object):
-
-    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False):
+# Block selection passes over candidates more coherent than this with one already picked in the block. 
+# Without it a block fills up with near copies of the best candidate (neighbouring point evaluations or
+# local averages), which costs far more accuracy than the block saves in time
+_BLOCK_COHERENCE = 0.5
+
+def _lazy_argmax(heap, evaluate, active, gamma=1.0):
+    """ Lazy greedy selection. The heap holds entries (-b_j, j), where b_j is an upper bound of the criterion
+        of candidate j that was valid when it was last evaluated, and stays valid as the greedy space grows. 
+        Candidates are popped in order of their bounds and evaluate(j) returns their exact criterion along with
+        a fresh bound, until the best exact criterion found is at least gamma times every remaining bound, so 
+        gamma = 1 gives the exact argmax and gamma < 1 is a weak greedy choice. Returns the index, the criterion
+        and the number of evaluations made. """
+
+    best_j, best_crit = -1, -np.inf
+    evaluated = []
+    while len(heap) > 0 and best_crit < gamma * -heap[0][0]:
+        _, j = heapq.heappop(heap)
+        if not active[j]:
+            continue
+        crit, bound = evaluate(j)
+        evaluated.append((-bound, j))
+        if crit > best_crit:
+            best_j, best_crit = j, crit
+
+    for entry in evaluated:
+        heapq.heappush(heap, entry)
+
+    return best_j, best_crit, len(evaluated)
+
+def _block_select(crit, active, k, coherent=None, largest=True):
+    """ The best k active candidates by the criterion, best first. If given, coherent(picks, j) says whether
+        candidate j is too coherent with any of the picks so far, and it is then passed over. It should only 
+        use what the picks need computed anyway, as it is called for every candidate looked at """
+
+    order = np.argsort(-crit if largest else crit, kind='stable')
+    order = order[active[order]]
+    if coherent is None:
+        return order[:k]
+    
+    picks = []
+    for j in order:
+        if len(picks) >= k:
+            break
+        if len(picks) == 0 or not coherent(picks, j):
+            picks.append(j)
+
+    return np.array(picks, dtype=np.int64)
+
+def _save_checkpoint(file_name, state):
+    """ Write the state arrays to a compressed npz file. We write to a temporary file first and then move it
+        over the old checkpoint, so that a job dying part way through a save leaves the last one intact """
+    if not file_name.endswith('.npz'):
+        file_name += '.npz'
+    tmp_name = file_name[:-4] + '.tmp.npz'
+    np.savez_compressed(tmp_name, **state)
+    os.replace(tmp_name, file_name)
+
+def _checkpoint_state(obj, attrs):
+    """ The attributes (along with any lazy heap and BasisPair cross-grammian) that a greedy object keeps 
+        in its checkpoints """
+    state = {a: getattr(obj, a) for a in attrs if getattr(obj, a, None) is not None}
+    if getattr(obj, 'BP', None) is not None and obj.BP.CG is not None:
+        state['BP_CG'] = obj.BP.CG
+    if getattr(obj, '_heap', None) is not None:
+        state['heap_keys'] = np.array([key for key, j in obj._heap])
+        state['heap_idx'] = np.array([j for key, j in obj._heap], dtype=np.int64)
+    return state
+
+def _restore_state(obj, data, attrs):
+    """ Set the attributes from a loaded checkpoint. Arrays of the right shape are copied into in place, 
+        which keeps any that live in shared memory (see ShardPool) where they are """
+    for a in attrs:
+        if a not in data:
+            continue
+        val = data[a]
+        if val.ndim == 0:
+            val = val.item()
+        cur = getattr(obj, a, None)
+        if isinstance(cur, np.ndarray) and isinstance(val, np.ndarray) and cur.shape == val.shape and cur.dtype == val.dtype:
+            cur[...] = val
+        else:
+            setattr(obj, a, val)
+    
+    if 'heap_keys' in data:
+        obj._heap = list(zip(data['heap_keys'].tolist(), data['heap_idx'].tolist()))
+
+def _pp_criterion(Wdict, z_perp_sq, w_perp):
+    """ Adding z to Zn reduces the residual of w by the component of w_perp along z_perp, the part 
+        of z orthogonal to Zn, so || w_perp ||^2 - <w_perp, z>^2 / || z_perp ||^2 scores every candidate
+        at once. Candidates already in the span of Zn leave the residual as it is. """
+    indep = z_perp_sq >= _LD_ATOL * _LD_ATOL
+
+    p_V_d = np.full(len(z_perp_sq), w_perp @ w_perp)
+    p_V_d[indep] -= (Wdict[indep] @ w_perp) ** 2 / z_perp_sq[indep]
+    return np.sqrt(np.maximum(p_V_d, 0.0))
+
+# Kernels for the sharded scans of the dictionary, see ShardPool
+
+def _shard_abs_dot(arrays, lo, w_perp):
+    return local_best(np.abs(arrays['Wdict'] @ w_perp), arrays['active'], lo)
+
+def _shard_pp(arrays, lo, w_perp):
+    return local_best(_pp_criterion(arrays['Wdict'], arrays['z_perp_sq'], w_perp), arrays['active'], lo, largest=False)
+
+def _shard_pp_update(arrays, lo, q):
+    arrays['z_perp_sq'] -= (arrays['Wdict'] @ q) ** 2
+
+
+class GreedyTrace(object):
+    """ A structured record of every step of a greedy construction. Set it as the trace attribute of any of 
+        the greedy objects (e.g. g.trace = GreedyTrace('run.csv')) and each step appends a record of the 
+        selected index and its criterion, beta (when the step computed it anyway), the wall time spent in 
+        each phase - scoring, Grammian updates, orthonormalisation and SVDs - the number of dot products 
+        and dense solves / factorisations, and the peak memory of the process in Mb. A block step is one
+        record, with the first of its picks. The records are given as a numpy record array by as_array, 
+        and are also written to a csv file as they are made if a file name is given. """
+
+    phases = ['score', 'gram', 'ortho', 'svd']
+    fields = ['step', 'index', 'n_added', 'crit', 'beta', 'time', 't_score', 't_gram', 't_ortho', 't_svd', 'dots', 'solves', 'peak_mem']
+
+    def __init__(self, file_name=None):
+
+        self.records = []
+        self.file_name = file_name
+        if file_name is not None:
+            with open(file_name, 'w') as f:
+                f.write(','.join(self.fields) + '\n')
+
+        self._stack = []
+        self.start_step()
+
+    def start_step(self):
+        self._t0 = time.perf_counter()
+        self._dots0 = Vector.n_dots
+        self._times = dict.fromkeys(self.phases, 0.0)
+        self._solves = 0
+
+    @contextlib.contextmanager
+    def phase(self, name, solves=0):
+        """ Time a phase of the step, which does the given number of solves. Phases can be nested, and the 
+            time spent in an inner phase is only counted there """
+        self._solves += solves
+        now = time.perf_counter()
+        if self._stack:
+            self._times[self._stack[-1][0]] += now - self._stack[-1][1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, start = self._stack.pop()
+            self._times[name] += now - start
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def count_solve(self, n=1):
+        self._solves += n
+
+    def end_step(self, index, crit, beta=np.nan, n_added=1):
+        record = {'step': len(self.records), 'index': index, 'n_added': n_added, 'crit': crit, 'beta': beta, 
+                  'time': time.perf_counter() - self._t0, 'dots': Vector.n_dots - self._dots0, 'solves': self._solves,
+                  'peak_mem': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else np.nan}
+        for p in self.phases:
+            record['t_' + p] = self._times[p]
+        self.records.append(record)
+
+        if self.file_name is not None:
+            with open(self.file_name, 'a') as f:
+                f.write(','.join(str(record[k]) for k in self.fields) + '\n')
+
+        self.start_step()
+
+    def as_array(self):
+        if len(self.records) == 0:
+            return None
+        return np.rec.fromrecords([tuple(r[k] for k in self.fields) for r in self.records], names=self.fields)
+
+def _trace_phase(trace, name, solves=0):
+    """ The trace's timer for the phase, or nothing if there is no trace """
+    if trace is None:
+        return contextlib.nullcontext()
+    return trace.phase(name, solves)
+
+class _GreedyBase(object):
+    """ What the greedy constructions of Wm and of Vn share """
+
+    def _argmax(self, crit):
+        """ The argmax of a criterion over the active part of the dictionary """
+        return np.argmax(np.where(self.active, crit, -np.inf))
+
+    def _select_block(self, crit, k, coherent, coherence, largest=True):
+        """ The picks of a block (see _block_select), with a warning if the coherence screen leaves it short """
+        picks = _block_select(crit, self.active, k, coherent, largest)
+        if len(picks) < min(k, self.active.sum()):
+            warnings.warn('{0}: only {1} of the {2} picks of the block passed the coherence screen ({3})'.format(self.__class__.__name__, len(picks), k, coherence))
+        return picks
+
+    def _step_checkpoint(self, checkpoint, checkpoint_every):
+        if checkpoint is None:
+            return
+        self._steps_since_checkpoint += 1
+        if self._steps_since_checkpoint >= checkpoint_every:
+            self.save_checkpoint(checkpoint)
+            self._steps_since_checkpoint = 0
+
+class GreedyMeasurement(_GreedyBase):
+
+    # What goes in a checkpoint, along with the Grammian of Wm and the cross-grammian of the BasisPair
+    _checkpoint_attrs = ['sel_crit', 'block_crit', 'dict_sel', 'active', 'DV', 'DQ', 'QV', 'DV_perp', 'refined_x']
+
+    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False, family=None, n_refine=3):
         """ We need to be either given a dictionary or a point generator that produces d-dimensional points
-            from which we generate the dictionary. """
+            from which we generate the dictionary. If the dictionary is a grid of a continuous family of 
+            measurements (see MeasurementFamily) then giving the family refines each choice by searching
+            the locations around the best n_refine candidates (see _refine_choice). """
         
         self.dictionary = copy.copy(dictionary)
         
@@ -46,6 +266,36 @@ class GreedyMeasurement(object):
         self.verbose = verbose
         self.remove = remove
         self.sel_crit = np.zeros(self.m)
+        # In block mode sel_crit holds the criterion of each element at the moment it was added, and 
+        # block_crit the (stale) value it was picked with at the start of its block
+        self.block_crit = np.zeros(self.m)
+
+        # Removal only switches elements off in the active mask, so that dict_sel and all the cached 
+        # arrays below keep indexing the original dictionary. Vectors given in Wm are recorded as -1
+        self.active = np.ones(len(self.dictionary), dtype=bool)
+        self.dict_sel = -np.ones(self.m, dtype=np.int32)
+
+        # Cross-grammians of the dictionary against Vn (DV) and against the orthonormalised Wm (DQ),
+        # along with QV = <q_k, phi_j> and the residual DV_perp = <d_i, phi_j - P_Wm phi_j>. These are
+        # only built by the methods that score candidates in coefficient space, and then gain one 
+        # column / row per step in _update_cross_grammians
+        self.DV = self.DQ = self.QV = self.DV_perp = None
+
+        # Refined measurements are appended to the dictionary, so that they are selected just like the rest,
+        # and refined_x keeps their locations so a checkpoint can make them again
+        self.family = family
+        self.n_refine = n_refine
+        self.n_grid = len(self.dictionary)
+        self.refined_x = np.array([])
+        if family is not None:
+            self._locations = np.array([family.location(d) for d in self.dictionary])
+
+        # The criterion of the whole dictionary from the last next_step_choice, which _refine_choice
+        # takes its candidates from rather than scoring the dictionary again
+        self._next_crit = None
+
+        self._steps_since_checkpoint = 0
+        self.trace = None
 
     def initial_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
@@ -57,105 +307,432 @@ class GreedyMeasurement(object):
         inheritors of this class are expected to overwrite this method to suit their needs. """
         pass
 
-    def construct_to_m(self, m_goal):
-
+    def _criterion(self, idx=None):
+        """ The selection criterion of the dictionary elements idx (all of them if None) for the current
+            Wm. Inheritors need to overwrite this to use block selection """
+        raise Exception('{0}: block selection is not available'.format(self.__class__.__name__))
+
+    def _row_criterion(self, rows):
+        """ The selection criterion of candidates from their rows of DV_perp. Inheritors need to overwrite
+            this to search a continuous family """
+        raise Exception('{0}: continuous refinement is not available'.format(self.__class__.__name__))
+
+    def _family_row(self, w):
+        """ The dots of a measurement w against Vn and the orthonormal Wm of the BasisPair, and its row 
+            <w, phi_j - P_Wm phi_j> of DV_perp """
+        dv = np.array([w.dot(phi) for phi in self.Vn.vecs])
+        dq = np.array([w.dot(q) for q in self.BP.Wm.vecs])
+        return dv - dq @ self.BP.CG, dv, dq
+
+    def _refine_choice(self, ni, crit, full=None):
+        """ Search the family between the neighbouring grid locations of the n_refine best candidates 
+            with a bounded 1-d optimisation of the exact criterion. If this beats crit then the better 
+            measurement is added to the dictionary and chosen instead. The candidates are taken from full,
+            the criterion of the whole dictionary that ni was chosen from, which is only computed again
+            if it is not given. """
+        if full is None:
+            full = self._criterion()
+        cand = np.argsort(-np.where(self.active, full, -np.inf), kind='stable')[:self.n_refine]
+
+        locs = np.sort(self._locations)
+        best_x = None
+        for j in cand:
+            x = self._locations[j]
+            pos = np.searchsorted(locs, x)
+            lo = locs[pos-1] if pos > 0 else self.family.bounds[0]
+            hi = locs[pos+1] if pos + 1 < len(locs) else self.family.bounds[1]
+
+            res = scipy.optimize.minimize_scalar(lambda y: -self._row_criterion(self._family_row(self.family(y))[0]),
+                                                 bounds=(lo, hi), method='bounded', options={'xatol': 1e-4 * (hi - lo)})
+            if -res.fun > crit:
+                best_x, crit = res.x, -res.fun
+
+        if best_x is None:
+            return ni, crit
+        
         if self.verbose:
-            print('i \t || P_Vn (w - P_Wm w) ||')
+            print('\t refined to x = {0} \t {1}'.format(best_x, crit))
+        return self._append_to_dictionary(best_x), crit
+
+    def _append_to_dictionary(self, x):
+        """ Add the family's measurement at x to the end of the dictionary, along with its rows of the cached
+            cross-grammians, and return its index """
+        w = self.family(x)
+        row, dv, dq = self._family_row(w)
+
+        self.dictionary.append(w)
+        self._locations = np.append(self._locations, x)
+        self.refined_x = np.append(self.refined_x, x)
+        self.active = np.append(self.active, True)
+
+        if self.DV is not None:
+            if self.DQ.shape[1] < len(dq):
+                self.DQ = np.pad(self.DQ, ((0,0),(0,len(dq) - self.DQ.shape[1])), 'constant')
+            self.DV = np.vstack((self.DV, dv))
+            self.DQ = np.vstack((self.DQ, np.pad(dq, (0, self.DQ.shape[1] - len(dq)), 'constant')))
+            self.DV_perp = np.vstack((self.DV_perp, row))
+
+        return len(self.dictionary) - 1
+
+    def next_block_choice(self, k, coherence=_BLOCK_COHERENCE):
+        """ Add the top k candidates of the current criterion to Wm in one go, passing over those more 
+            coherent than coherence with one already picked (None turns this off). The first pick is the plain
+            greedy choice, the rest are added without re-scoring the dictionary, so comparing sel_crit (the 
+            value each one had when it was added) with block_crit (what it was picked with) shows what the 
+            block gave up. Picks that have become redundant within the block are dropped. 
+            
+            The coherence is that of the rows of DV_perp, which are all that the criteria see of a candidate, so
+            the screen needs no ambient space work. Each pick's dictionary dots are then computed once, and 
+            give both its cross-grammian update and its rows of the Grammian of Wm, which grows once for the 
+            whole block along with the BasisPair (see _extend_Wm). Returns the picks that were added. """
+        
+        crit = self._criterion()
+
+        # The coherence screen uses DV_perp as it was when the block was picked
+        R = self.DV_perp
+        R_norms = np.linalg.norm(R, axis=1)
+        def coherent(picks, j):
+            return np.any(np.abs(R[picks] @ R[j]) > coherence * R_norms[picks] * R_norms[j])
+
+        picks = self._select_block(crit, k, None if coherence is None else coherent, coherence)
+
+        rows = {}
+        sel = []
+        for ni in picks:
+            realised = self._criterion([ni])[0]
+            if len(sel) > 0 and realised <= _LD_ATOL:
+                continue
+            self._record_choice(ni, realised, crit[ni])
+            if self.DQ is not None:
+                with _trace_phase(self.trace, 'gram'):
+                    rows[ni] = self._dictionary_dots(self.dictionary[ni])
+                    self._update_cross_grammians(ni, rows[ni])
+            sel.append(ni)
 
-        if self.Wm.n == 0:
-            n0, crit = self.initial_choice()
+            if self.verbose:
+                print('{0} : \t {1} \t {2} \t (picked with {3})'.format(self.Wm.n + len(sel), ni, realised, crit[ni]))
 
-            self.sel_crit = np.append(self.sel_crit, crit)
-            
-            self.Wm.add_vector(self.dictionary[n0])
+        self._extend_Wm(sel, rows)
+
+        return np.array(sel, dtype=np.int32)
+
+    def _dictionary_dots(self, v):
+        """ The dots of v against the whole dictionary - this is the only ambient space work per step, and 
+            is done in one go where the vectors allow it (see Vector.dots) """
+        return v.dots(self.dictionary)
+
+    def _init_cross_grammians(self, DV=None):
+        """ Build DV once (unless it is given), and DQ, QV for whatever is already in Wm """
+        if DV is not None:
+            self.DV = np.array(DV, dtype=float)
+        else:
+            self.DV = np.zeros((len(self.dictionary), self.Vn.n))
+            for j, phi in enumerate(self.Vn.vecs):
+                self.DV[:, j] = self._dictionary_dots(phi)
+        
+        self.DQ = np.zeros((len(self.dictionary), 0))
+        self.QV = np.zeros((0, self.Vn.n))
+        if self.Wm.n > 0:
+            Q = self.Wm.orthonormalise()
+            for q in Q.vecs:
+                self.DQ = np.hstack((self.DQ, self._dictionary_dots(q)[:,np.newaxis]))
+            self.QV = Q.cross_grammian(self.Vn)
+
+        self.DV_perp = self.DV - self.DQ @ self.QV
+
+    def warm_start(self, sel, DV=None):
+        """ Start Wm from the dictionary elements sel, e.g. the dict_sel of a PivotedQRSelection, so that
+            further greedy steps refine that choice. Its cross-grammian DV of the dictionary and Vn can be
+            given, to save computing it again. """
+        if self.Wm.n > 0:
+            raise Exception('{0}: can only warm start an empty Wm'.format(self.__class__.__name__))
+        
+        self._init_cross_grammians(DV)
+        for ni in sel:
+            self._add_Wm_vector(ni, np.nan)
+
+    def _update_cross_grammians(self, ni, g=None):
+        """ One Gram-Schmidt step carried out in coefficient space. When w = dictionary[ni] joins Wm, 
+            its coefficients in the current orthonormal Wm are a = DQ[ni], and the new direction 
+            q = (w - P_Wm w) / || w - P_Wm w || has dictionary dots (g - DQ a) / || w - P_Wm w ||, 
+            where g are the dots of w against the dictionary (computed here unless given) """
+        if g is None:
+            g = self._dictionary_dots(self.dictionary[ni])
+        a = self.DQ[ni, :]
+        
+        w_perp_norm = math.sqrt(max(g[ni] - a @ a, 0.0))
+        if w_perp_norm < _LD_ATOL:
+            warnings.warn('{0}: selected vector is linearly dependent on Wm, not updating cross-grammians'.format(self.__class__.__name__))
+            return
+
+        dq = (g - self.DQ @ a) / w_perp_norm
+        qv = (self.DV[ni, :] - a @ self.QV) / w_perp_norm
+
+        self.DQ = np.hstack((self.DQ, dq[:,np.newaxis]))
+        self.QV = np.vstack((self.QV, qv))
+        self._downdate_DV_perp(dq, qv)
+
+    def _downdate_DV_perp(self, dq, qv):
+        self.DV_perp -= np.outer(dq, qv)
+
+    def extend_Vn(self, Vn):
+        """ Carry on with a larger Vn, whose first elements are the current Vn (e.g. the next subspace of
+            a hierarchical basis), keeping the Wm built so far. The new elements are added to Vn in place,
+            so only their columns of the cached cross-grammians and of the BasisPair are computed, and the 
+            next construct_to_m / construct_to_beta picks up from the current Wm """
+        if Vn.n < self.Vn.n:
+            raise Exception('{0}: can only extend Vn, not shrink it from {1} to {2}'.format(self.__class__.__name__, self.Vn.n, Vn.n))
+        
+        for phi in Vn.vecs[self.Vn.n:]:
+            if self.BP is not None and self.BP.Vn is self.Vn:
+                with _trace_phase(self.trace, 'ortho'):
+                    self.BP.add_Vn_vector(phi)
+            else:
+                self.Vn.add_vector(phi)
+
+            if self.DV is not None:
+                with _trace_phase(self.trace, 'gram'):
+                    self._extend_cross_grammians(self.Vn.vecs[-1])
+
+    def _extend_cross_grammians(self, phi):
+        """ The new column of DV is the only ambient space work, and the new column of QV is the last 
+            column of the BasisPair cross-grammian if we have one """
+        dv = self._dictionary_dots(phi)
+        if self.BP is not None and self.BP.Vn is self.Vn and self.BP.Wm.n == self.QV.shape[0]:
+            qv = self.BP.CG[:, -1]
+        else:
+            qv = self.Wm.orthonormalise().dot(phi) if self.QV.shape[0] > 0 else np.zeros(0)
+
+        self.DV = np.hstack((self.DV, dv[:,np.newaxis]))
+        self.QV = np.hstack((self.QV, qv[:,np.newaxis]))
+        self.DV_perp = np.hstack((self.DV_perp, (dv - self.DQ @ qv)[:,np.newaxis]))
+
+    def _add_Wm_vector(self, ni, crit, block_crit=None):
+        """ Add dictionary[ni] to Wm (and the BasisPair if we have one), and keep any cached
+            cross-grammians in step """
+        self._record_choice(ni, crit, block_crit)
+
+        if self.DQ is not None:
+            with _trace_phase(self.trace, 'gram'):
+                self._update_cross_grammians(ni)
+
+        self._extend_Wm([ni])
+
+    def _record_choice(self, ni, crit, block_crit=None):
+        self.sel_crit = np.append(self.sel_crit, crit)
+        self.block_crit = np.append(self.block_crit, crit if block_crit is None else block_crit)
+        self.dict_sel = np.append(self.dict_sel, ni)
+
+    def _extend_Wm(self, sel, rows=None):
+        """ Add the dictionary elements sel (already recorded in dict_sel) to Wm and the BasisPair, padding 
+            their Grammians once. Given rows, the dictionary dots of each of sel, the new rows of the Grammian
+            of Wm are read off them when all of Wm comes from the dictionary, and the new rows of the BasisPair
+            cross-grammian are those the cross-grammian updates just added to QV """
+        if len(sel) == 0:
+            return
+        vecs = [self.dictionary[ni] for ni in sel]
+
+        if self.BP is not None:
+            CG_rows = None
+            if self.QV is not None and self.BP.Vn is self.Vn:
+                CG_rows = self.QV[self.BP.Wm.n:]
+            with _trace_phase(self.trace, 'ortho'):
+                self.BP.add_Wm_vectors(vecs, CG_rows)
+
+        with _trace_phase(self.trace, 'gram'):
+            G_rows = None
+            if rows is not None and all(ni in rows for ni in sel) and np.all(self.dict_sel >= 0):
+                G_rows = np.array([rows[ni][self.dict_sel] for ni in sel])
+            self.Wm.add_vectors(vecs, G_rows)
             self.m = self.Wm.n
-    
-            if self.remove:
-                del self.dictionary[n0]
 
-        if self.BP is None:
-            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
-        elif self.BP.Wm is not self.Wm.orthonormal_basis or self.BP.Vn is not self.Vn:
-            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
+        if self.remove:
+            self.active[sel] = False
+
+    def save_checkpoint(self, file_name):
+        """ Save the selections, criteria, active mask, cross-grammians and the Grammian / cross-grammian
+            of Wm and the BasisPair to a compressed npz file """
+        state = _checkpoint_state(self, self._checkpoint_attrs)
+        if self.Wm.G is not None:
+            state['Wm_G'] = self.Wm.G
+        _save_checkpoint(file_name, state)
+
+    def load_checkpoint(self, file_name):
+        """ Carry on from a checkpoint made by a run with the same dictionary, Vn and starting Wm. The
+            selected elements are added back to Wm without computing any dot products, and none of the
+            earlier steps are redone. Returns the loaded data """
+        data = np.load(file_name)
+
+        n_given = (data['dict_sel'] < 0).sum()
+        if self.Wm.n != n_given:
+            raise Exception('{0}: the checkpoint started from a Wm with {1} elements, not {2}'.format(self.__class__.__name__, n_given, self.Wm.n))
+
+        _restore_state(self, data, self._checkpoint_attrs)
+
+        if len(self.refined_x) > 0 and self.family is None:
+            raise Exception('{0}: the checkpoint has refined measurements, but we have no family to make them'.format(self.__class__.__name__))
+        for x in self.refined_x[len(self.dictionary) - self.n_grid:]:
+            self.dictionary.append(self.family(x))
+            self._locations = np.append(self._locations, x)
+        
+        if not self.Wm.is_orthonormal:
+            self.Wm.G = None
+        for ni in self.dict_sel[n_given:]:
+            self.Wm.add_vector(self.dictionary[ni])
+        if 'Wm_G' in data:
+            self.Wm.G = data['Wm_G']
+        self.m = self.Wm.n
+
+        if 'BP_CG' in data:
+            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn, CG=data['BP_CG'])
+        
+        return data
+
+    def construct_to_m(self, m_goal, block=1, coherence=_BLOCK_COHERENCE, checkpoint=None, checkpoint_every=1):
+        """ Greedily add to Wm until it has m_goal elements, block elements at a time if block > 1 
+            (see next_block_choice). If a checkpoint file name is given the state is saved there every 
+            checkpoint_every steps (or blocks) and at the end, see load_checkpoint """
+
+        if self.verbose:
+            print('i \t || P_Vn (w - P_Wm w) ||')
+
+        if self.trace is not None:
+            self.trace.start_step()
+
+        if self.Wm.n == 0:
+            with _trace_phase(self.trace, 'score'):
+                n0, crit = self.initial_choice()
+            self._add_Wm_vector(n0, crit)
+            if self.trace is not None:
+                self.trace.end_step(n0, crit)
+
+        if self.BP is None or self.BP.Wm is not self.Wm.orthonormal_basis or self.BP.Vn is not self.Vn:
+            with _trace_phase(self.trace, 'ortho'):
+                self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
         
         while self.Wm.n < m_goal:
             
-            ni, crit = self.next_step_choice(self.Wm.n)
+            m0 = self.Wm.n
+            if block > 1:
+                with _trace_phase(self.trace, 'score'):
+                    self.next_block_choice(min(block, m_goal - self.Wm.n), coherence)
+            else:
+                with _trace_phase(self.trace, 'score'):
+                    ni, crit = self.next_step_choice(self.Wm.n)
+                    if self.family is not None:
+                        ni, crit = self._refine_choice(ni, crit, self._next_crit)
+                self._add_Wm_vector(ni, crit)
             
-            self.sel_crit = np.append(self.sel_crit, crit)
-
-            self.BP.add_Wm_vector(self.dictionary[ni])
-            self.Wm.add_vector(self.dictionary[ni])
-            self.m = self.Wm.n
+            if self.trace is not None:
+                self.trace.end_step(self.dict_sel[m0], self.sel_crit[m0], n_added=self.Wm.n - m0)
 
-            if self.remove:
-                del self.dictionary[ni]
+            self._step_checkpoint(checkpoint, checkpoint_every)
                    
+        if checkpoint is not None:
+            self.save_checkpoint(checkpoint)
+
         if self.verbose:
             print('\n\nDone!')
         
         return self.Wm
 
-    def construct_to_beta(self, beta_goal, m_max_ratio=10):
+    def construct_to_beta(self, beta_goal, m_max_ratio=10, block=1, coherence=_BLOCK_COHERENCE, checkpoint=None, checkpoint_every=1):
+        """ Greedily add to Wm until the inf-sup constant beta(Vn, Wm) reaches beta_goal. In block mode
+            beta is only checked at the end of each block """
 
         if self.verbose:
             print('i \t || P_Vn (w - P_Wm w) ||')
 
-        if self.Wm.n == 0:
-            n0, crit = self.initial_choice()
-            self.sel_crit = np.append(self.sel_crit, crit)
-                
-            self.Wm.add_vector(self.dictionary[n0])
-            self.m = self.Wm.n
-        
-            if self.remove:
-                del self.dictionary[n0]
+        if self.trace is not None:
+            self.trace.start_step()
 
-        if self.BP is None:
-            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
-        elif self.BP.Wm is not self.Wm.orthonormal_basis or self.BP.Vn is not self.Vn:
-            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
+        if self.Wm.n == 0:
+            with _trace_phase(self.trace, 'score'):
+                n0, crit = self.initial_choice()
+            self._add_Wm_vector(n0, crit)
+            if self.trace is not None:
+                self.trace.end_step(n0, crit)
+
+        if self.BP is None or self.BP.Wm is not self.Wm.orthonormal_basis or self.BP.Vn is not self.Vn:
+            with _trace_phase(self.trace, 'ortho'):
+                self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
         
-        while self.BP.beta() < beta_goal:
-            ni, crit = self.next_step_choice(self.Wm.n)
+        with _trace_phase(self.trace, 'svd', solves=1):
+            beta = self.BP.beta()
+
+        while beta < beta_goal:
+            m0 = self.Wm.n
+            if block > 1:
+                with _trace_phase(self.trace, 'score'):
+                    self.next_block_choice(block, coherence)
+            else:
+                with _trace_phase(self.trace, 'score'):
+                    ni, crit = self.next_step_choice(self.Wm.n)
+                    if self.family is not None:
+                        ni, crit = self._refine_choice(ni, crit, self._next_crit)
+                self._add_Wm_vector(ni, crit)
+
+            with _trace_phase(self.trace, 'svd', solves=1):
+                beta = self.BP.beta()
             
-            self.sel_crit = np.append(self.sel_crit, crit)
-            
-            self.BP.add_Wm_vector(self.dictionary[ni])
-            self.Wm.add_vector(self.dictionary[ni])
-
-            self.m = self.Wm.n
+            if self.trace is not None:
+                self.trace.end_step(self.dict_sel[m0], self.sel_crit[m0], beta=beta, n_added=self.Wm.n - m0)
 
-            if self.remove:
-                del self.dictionary[ni]
+            self._step_checkpoint(checkpoint, checkpoint_every)
             
             if self.Wm.n > m_max_ratio * self.Vn.n:
                 print('Ceiling reached for Wm size before beta_goal reached!')
                 break
 
+        if checkpoint is not None:
+            self.save_checkpoint(checkpoint)
+
         if self.verbose:
             print('\n\nDone!')
         
         return self.Wm
 
 class CollectiveOMP(GreedyMeasurement):
-    """ Probably should rename this class, but it implements the Collective OMP algorithm for constructing Wm """
+    """ Probably should rename this class, but it implements the Collective OMP algorithm for constructing Wm.
+
+        Unlike GreedyApprox there is no lazy mode. The criterion sum_j <phi_j, d - P_Wm d>^2 of a candidate d
+        need not decrease as Wm grows, and the bound lambda_max(G_Vn) || d - P_Wm d ||^2 that does is far too 
+        loose for point and local average measurements, so a lazy search still scored 40-99% of the dictionary
+        at every step (e.g. 2800-2880 of 3000), and was slower than the plain scan.
 
-    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False):
+        Nor is there a processes option as for the MeasBased greedies. Scoring is only a row-wise norm of 
+        DV_perp, and the time goes on the dictionary dots of each new element and the BasisPair update, so 
+        sharding DV_perp across a ShardPool only added its overheads (for N = 3000, n = 10 and m = 40, 1.43s 
+        with 2 processes and 1.60s with 4, against 1.12s serial). ShardPool only pays for the scans of the 
+        MeasBased greedies. """
+
+    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False, family=None, n_refine=3):
         """ We need to be either given a dictionary or a point generator that produces d-dimensional points
             from which we generate the dictionary. """
-        super().__init__(dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove)
-       
+        super().__init__(dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove, family=family, n_refine=n_refine)
+
+    def _criterion(self, idx=None):
+        """ We go through the dictionary and find the max of sum_j <phi_j - P_Wm phi_j, f>^2, 
+            which is just the row-wise norm of the residual cross-grammian """
+        if self.DV_perp is None:
+            self._init_cross_grammians()
+        
+        idx = slice(None) if idx is None else idx
+        return self._row_criterion(self.DV_perp[idx])
+
+    def _row_criterion(self, rows):
+        return (rows ** 2).sum(axis=-1)
+
     def initial_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
-       
-        norms = np.zeros(len(self.dictionary))
-        for i in range(len(self.dictionary)):
-            for phi in self.Vn.vecs:
-                norms[i] += phi.dot(self.dictionary[i]) ** 2
         
-        n0 = np.argmax(norms)
+        if self.DV_perp is None:
+            self._init_cross_grammians()
+
+        norms = (self.DV ** 2).sum(axis=1)
+        
+        n0 = self._argmax(norms)
 
         return n0, norms[n0]
 
@@ -163,43 +740,101 @@ class CollectiveOMP(GreedyMeasurement):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
  
-        next_crit = np.zeros(len(self.dictionary))
-        # We go through the dictionary and find the max of || f ||^2 - || P_Vn f ||^2
-        for phi in self.Vn.vecs:
-            phi_perp = phi - self.Wm.project(phi)
-            for j in range(len(self.dictionary)):
-                next_crit[j] += phi_perp.dot(self.dictionary[j]) ** 2
-                #p_V_d[i] = self.Wm.project(self.dictionary[i]).norm()
+        if self.DV_perp is None:
+            self._init_cross_grammians()
+
+        next_crit = self._next_crit = self._criterion()
 
-        ni = np.argmax(next_crit)
+        ni = self._argmax(next_crit)
+        crit = next_crit[ni]
         
         if self.verbose:
-            print('{0} : \t {1} \t {2}'.format(i, ni, next_crit[ni]))
+            print('{0} : \t {1} \t {2}'.format(i, ni, crit))
 
-        return ni, next_crit[ni]
+        return ni, crit
 
 class WorstCaseOMP(GreedyMeasurement):
     """ Now the slightly simpler (to analyse) parallel OMP that looks at Vn vecs individually """
 
-    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False):
+    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=False, family=None, n_refine=3):
         """ We need to be either given a dictionary or a point generator that produces d-dimensional points
             from which we generate the dictionary. """
-        super().__init__(dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove)
+        super().__init__(dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove, family=family, n_refine=n_refine)
         
         self.BP = None
         self.Vtilde = []
+        self.v_worst = None
+
+    def _criterion(self, idx=None):
+        """ QV is the cross-grammian of the orthonormal Wm and Vn, so its SVD gives us the worst case 
+            vector v of Vn without having to rebuild a BasisPair every step, and then we go through the 
+            dictionary and find the max of | < v - P_Wm v, f > |. Scoring only some of the dictionary 
+            (idx) keeps the last worst case vector, which is what a block is picked against. """
+        if not self.Vn.is_orthonormal:
+            raise Exception('Vn must be orthonormal to calculate the worst case singular vec!')
+
+        if self.DV_perp is None:
+            self._init_cross_grammians()
+
+        if idx is None:
+            self.v_worst = self._worst_coeffs(self.QV)
+            idx = slice(None)
+
+        return self._row_criterion(self.DV_perp[idx])
+
+    def _worst_coeffs(self, QV):
+        """ The coefficients in Vn of its worst case unit vector for the Wm whose cross-grammian with Vn is QV,
+            i.e. the right singular vector of its smallest singular value """
+        with _trace_phase(self.trace, 'svd', solves=1):
+            U, S, V = np.linalg.svd(QV)
+        return V[-1, :]
+
+    def _row_criterion(self, rows):
+        return np.abs(rows @ self.v_worst)
+
+    def _rebuild_Vtilde(self, k0):
+        """ Vtilde for the elements of Wm from k0 on, i.e. the worst case vector each would have been picked
+            against: the first element of Vn for the first one, and then the worst case vector of Vn for the 
+            Wm made of the elements before it, from the rows of QV. Elements picked together in a block all 
+            shared the vector at the start of the block, so for them this is what one at a time would use """
+        if not self.Vn.is_orthonormal:
+            raise Exception('Vn must be orthonormal to calculate the worst case singular vec!')
+
+        self.Vtilde = [self.Vn.vecs[0] if k == 0 else self.Vn.reconstruct(self._worst_coeffs(self.QV[:k])) 
+                       for k in range(k0, self.Wm.n)]
+        self.v_worst = self._worst_coeffs(self.QV)
+
+    def warm_start(self, sel, DV=None):
+        """ As for GreedyMeasurement, but we also rebuild Vtilde (see _rebuild_Vtilde) """
+        if not self.Vn.is_orthonormal:
+            raise Exception('Vn must be orthonormal to calculate the worst case singular vec!')
+
+        super().warm_start(sel, DV)
+        self._rebuild_Vtilde(0)
+
+    def load_checkpoint(self, file_name):
+        """ As for GreedyMeasurement, but Vtilde isn't saved, so we rebuild it (see _rebuild_Vtilde) """
+        data = super().load_checkpoint(file_name)
+        self._rebuild_Vtilde((data['dict_sel'] < 0).sum())
+        return data
+
+    def next_block_choice(self, k, coherence=_BLOCK_COHERENCE):
+        picks = super().next_block_choice(k, coherence)
+        v = self.Vn.reconstruct(self.v_worst)
+        self.Vtilde += [v] * (self.Wm.n - len(self.Vtilde))
+        return picks
 
     def initial_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
         
-        v0 = self.Vn.vecs[0]
+        if self.DV_perp is None:
+            self._init_cross_grammians()
 
-        dots = np.zeros(len(self.dictionary))
-        for i, d in enumerate(self.dictionary):
-            dots[i] = v0.dot(d)
+        v0 = self.Vn.vecs[0]
+        dots = self.DV[:, 0]
         
-        n0 = np.argmax(dots)
+        n0 = self._argmax(dots)
       
         self.Vtilde.append(v0)
 
@@ -208,19 +843,10 @@ class WorstCaseOMP(GreedyMeasurement):
     def next_step_choice(self, i):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
-        if self.BP.Wm is not self.Wm.orthonormal_basis or self.BP.Vn is not self.Vn:
-            self.BP = BasisPair(self.Wm.orthonormalise(), self.Vn)
-        
-        next_crit = np.zeros(len(self.dictionary))
- 
-        # We go through the dictionary and find the max of || f ||^2 - || P_Vn f ||^2
-        v = self.BP.Vn_singular_vec(-1)
-        v_perp = v - self.Wm.project(v)
-        for j in range(len(self.dictionary)):
-            next_crit[j] = abs(v_perp.dot(self.dictionary[j]))
+        next_crit = self._next_crit = self._criterion()
          
-        ni = np.argmax(next_crit)
-        self.Vtilde.append(v)
+        ni = self._argmax(next_crit)
+        self.Vtilde.append(self.Vn.reconstruct(self.v_worst))
         
         if self.verbose:
             print('{0} : \t {1} \t {2}'.format(i, ni, next_crit[ni]))
@@ -231,22 +857,55 @@ class WorstVecOMP(CollectiveOMP):
     """ Now we look at the worst of the basis vectors instead of over the whole space.. hopefully easier to
         analyse and prove, and faster to do... """
 
-    def __init__(self, m, dictionary, Vn, Wm=None, verbose=False, remove=True):
+    _checkpoint_attrs = CollectiveOMP._checkpoint_attrs + ['phi_perp_sq']
+
+    def __init__(self, dictionary, Vn, Wm=None, verbose=False, remove=True, family=None, n_refine=3):
         """ We need to be either given a dictionary or a point generator that produces d-dimensional points
             from which we generate the dictionary. """
-        super().__init__(m, dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove)
+        super().__init__(dictionary, Vn, Wm=Wm, verbose=verbose, remove=remove, family=family, n_refine=n_refine)
+
+        # The squared residuals || phi_j - P_Wm phi_j ||^2, which drop by QV[k, j]^2 for every new
+        # orthonormal direction q_k in Wm
+        self.phi_perp_sq = None
             
+    def _init_cross_grammians(self, DV=None):
+        super()._init_cross_grammians(DV)
+        self.phi_perp_sq = np.diag(self.Vn.G) - (self.QV ** 2).sum(axis=0)
+
+    def _update_cross_grammians(self, ni, g=None):
+        k = self.QV.shape[0]
+        super()._update_cross_grammians(ni, g)
+        if self.QV.shape[0] > k:
+            self.phi_perp_sq -= self.QV[-1, :] ** 2
+
+    def _extend_cross_grammians(self, phi):
+        super()._extend_cross_grammians(phi)
+        self.phi_perp_sq = np.append(self.phi_perp_sq, self.Vn.G[-1, -1] - (self.QV[:, -1] ** 2).sum())
+
+    def _criterion(self, idx=None):
+        if self.DV_perp is None:
+            self._init_cross_grammians()
+
+        idx = slice(None) if idx is None else idx
+        return self._row_criterion(self.DV_perp[idx])
+
+    def _row_criterion(self, rows):
+        # First we find the phi_j that has the largest phi_j - P_Wm phi_j
+        phi_perps = np.sqrt(np.maximum(self.phi_perp_sq, 0.0))
+
+        # This corresponds with vector with the smallest singular value from the SVD
+        return np.abs(rows[..., phi_perps.argmin()])
+
     def initial_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
         
-        v0 = self.Vn.vecs[0]
+        if self.DV_perp is None:
+            self._init_cross_grammians()
 
-        dots = np.zeros(len(self.dictionary))
-        for i in range(len(self.dictionary)):
-            dots[i] = v0.dot(self.dictionary[i])
+        dots = self.DV[:, 0]
 
-        n0 = np.argmax(dots)
+        n0 = self._argmax(dots)
       
         return n0, dots[n0]
 
@@ -254,21 +913,9 @@ class WorstVecOMP(CollectiveOMP):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
         
-        next_crit = np.zeros(len(self.dictionary))
-        
-        phi_perps = np.zeros(self.Vn.n)
-        # First we find the phi_j that has the largest phi_j - P_Wm phi_j
-        for j in range(self.Vn.n):
-            phi_perps[j] = (self.Vn.vecs[j] - self.Wm.project(self.Vn.vecs[j])).norm()
-
-        # This corresponds with vector with the smallest singular value from the SVD
-        phi = self.Vn.vecs[phi_perps.argmin()]
-
-        phi_perp = phi - self.Wm.project(phi)
-        for j in range(len(self.dictionary)):
-            next_crit[j] = abs(phi_perp.dot(self.dictionary[j]))
+        next_crit = self._next_crit = self._criterion()
         
-        ni = np.argmax(next_crit)
+        ni = self._argmax(next_crit)
 
         if self.verbose:
             print('{0} : \t {1}'.format(i, next_crit[ni]))
@@ -285,13 +932,143 @@ One feature is the use of only the R^(n x m) representation of everything, savin
 product calculations in V_h or V, the ambient solution space
 
 """
+class PivotedQRSelection(object):
+    """ Measurement selection in the style of Q-DEIM. The cross-grammian DV of the dictionary and Vn is built
+        once, and then the first n measurements are the pivots of a column pivoted QR of DV^T (in the 
+        coordinates of an orthonormal Vn), after which each one added is the candidate with the largest 
+        component along the smallest right singular vector of the rows picked so far, which maximises a lower 
+        bound on the growth of the smallest singular value (as in GappyPOD+E). There are no dot products 
+        after DV apart from the Grammian of the picks, which also gives the whole beta curve. The picks can
+        be refined by an OMP through warm_start. """
+
+    def __init__(self, dictionary, Vn, verbose=False):
+        
+        self.dictionary = copy.copy(dictionary)
+        
+        self.Vn = Vn
+        self.Vn.make_grammian()
+        self.verbose = verbose
+
+        self.DV = None
+        self.dict_sel = np.array([], dtype=np.int32)
+        self.sel_crit = np.array([])
+        self.beta = np.array([])
+
+    def _init_cross_grammian(self):
+        self.DV = np.zeros((len(self.dictionary), self.Vn.n))
+        for j, phi in enumerate(self.Vn.vecs):
+            self.DV[:, j] = phi.dots(self.dictionary)
+        
+        # The cross-grammian against an orthonormal basis of Vn
+        L = scipy.linalg.cholesky(self.Vn.G, lower=True)
+        self.DV_ortho = scipy.linalg.solve_triangular(L, self.DV.T, lower=True).T
+
+    def _select(self, m):
+        """ The ordered picks, along with the pivot sizes and then the oversampling criterion """
+        n = min(m, self.Vn.n, len(self.dictionary))
+        R, P = scipy.linalg.qr(self.DV_ortho.T, mode='r', pivoting=True)
+        sel = list(P[:n])
+        crit = list(np.abs(np.diag(R)[:n]))
+
+        active = np.ones(len(self.dictionary), dtype=bool)
+        active[sel] = False
+        while len(sel) < min(m, len(self.dictionary)):
+            U, S, V = np.linalg.svd(self.DV_ortho[sel])
+            score = (self.DV_ortho @ V[-1, :]) ** 2
+            ni = np.argmax(np.where(active, score, -np.inf))
+            sel.append(ni)
+            crit.append(score[ni])
+            active[ni] = False
+
+        return np.array(sel, dtype=np.int32), np.array(crit)
+
+    def _beta_curve(self, G):
+        """ With G = L L^T the Grammian of the picks, L^-1 DV_ortho[sel] is the cross-grammian of the 
+            orthonormalised picks and Vn, and its first k rows are the same for the first k picks """
+        L = scipy.linalg.cholesky(G, lower=True)
+        CG = scipy.linalg.solve_triangular(L, self.DV_ortho[self.dict_sel], lower=True)
+        
+        beta = np.zeros(len(self.dict_sel))
+        for k in range(self.Vn.n, len(self.dict_sel) + 1):
+            beta[k-1] = np.linalg.svd(CG[:k], compute_uv=False)[-1]
+        return beta
+
+    def construct_to_m(self, m_goal):
+        """ Select m_goal measurements, and return them in order as Wm. beta[k-1] is then beta(Vn, W_k) for the
+            first k of them """
+        if self.DV is None:
+            self._init_cross_grammian()
+
+        self.dict_sel, self.sel_crit = self._select(m_goal)
+        
+        Wm = Basis([self.dictionary[i] for i in self.dict_sel], space=self.Vn.space)
+        Wm.make_grammian()
+        self.beta = self._beta_curve(Wm.G)
+
+        if self.verbose:
+            print('i \t Selection \t Sel. criteria \t beta')
+            for i, (ni, c, b) in enumerate(zip(self.dict_sel, self.sel_crit, self.beta)):
+                print('{0} : \t {1} \t {2} \t {3}'.format(i+1, ni, c, b))
+
+        self.Wm = Wm
+        return Wm
+
+    def construct_to_beta(self, beta_goal, m_max_ratio=10):
+        """ As the picks are nested we select m_max_ratio * n of them once, and keep the shortest run that 
+            reaches beta_goal """
+        Wm = self.construct_to_m(m_max_ratio * self.Vn.n)
+        
+        reached = np.flatnonzero(self.beta >= beta_goal)
+        if len(reached) == 0:
+            print('Ceiling reached for Wm size before beta_goal reached!')
+            return Wm
+
+        m = reached[0] + 1
+        self.dict_sel, self.sel_crit, self.beta = self.dict_sel[:m], self.sel_crit[:m], self.beta[:m]
+        self.Wm = Wm.subspace(slice(0, m))
+        return self.Wm
+
 class LinearlyDependent(Exception): pass
 
-class GreedyApprox(object):
+def _qr_add_column(Q, R, k, z):
+    """ Extends the thin QR factorisation Z = Q[:, :k] R[:k, :k] by the column z, in place in the 
+        pre-allocated Q and R, using Gram-Schmidt with one re-orthogonalisation pass. Returns the 
+        norm of the component of z orthogonal to the first k columns of Q. If that is below _LD_ATOL
+        then z is (numerically) in the span of Z and the new column of Q is left as zeros. """
+
+    r = Q[:, :k].T @ z
+    z_perp = z - Q[:, :k] @ r
+    s = Q[:, :k].T @ z_perp
+    z_perp -= Q[:, :k] @ s
+    r += s
+
+    z_perp_norm = np.linalg.norm(z_perp)
+    R[:k, k] = r
+    R[k, k] = z_perp_norm
+    if z_perp_norm >= _LD_ATOL:
+        Q[:, k] = z_perp / z_perp_norm
+
+    return z_perp_norm
 
-    def __init__(self, dictionary, Vn=None, verbose=False, remove=False):
+class GreedyApprox(_GreedyBase):
+
+    # Whether the criterion is maximised (or minimised) by the selection
+    _select_largest = True
+
+    # What goes in a checkpoint, along with the Grammian of Vn (and the cross-grammian of any BasisPair)
+    _checkpoint_attrs = ['sel_crit', 'block_crit', 'dict_sel', 'active', 'norms', 'DQ', 'res_sq', 'res_k', 'n_evals']
+
+    def __init__(self, dictionary, Vn=None, verbose=False, remove=False, lazy=False, gamma=1.0, coarse_div=None, sketch=None, shortlist=10):
         """ We need to be either given a dictionary or a point generator that produces d-dimensional points
-            from which we generate the dictionary. """
+            from which we generate the dictionary. With lazy=True the candidates are kept in a heap keyed by
+            their last computed criterion, which can only decrease as Vn grows, and only those that might
+            win are brought up to date at each step. gamma < 1 accepts a weak greedy choice. 
+            
+            For dyadic dictionaries, giving a coarse_div screens the dictionary with its versions on that 
+            coarser grid, and giving a Sketch screens it with a random embedding of its dot features (either
+            or both, see _screen_choice). Only the best shortlist candidates are then scored exactly. """
+        if lazy and (coarse_div is not None or sketch is not None):
+            raise Exception('{0}: choose either lazy or screening, not both'.format(self.__class__.__name__))
         
         self.dictionary = copy.copy(dictionary)
         
@@ -301,45 +1078,114 @@ class GreedyApprox(object):
         self.verbose = verbose
         self.remove = remove
         self.sel_crit = np.array([])
+        self.block_crit = np.array([])
         self.dict_sel = np.array([], dtype=np.int32)
+        
+        # Removal only switches elements off in the active mask, so that dict_sel and all the cached
+        # arrays keep indexing the original dictionary
+        self.active = np.ones(len(self.dictionary), dtype=bool)
+
+        # The dictionary norms, the dots DQ of the dictionary against the orthonormalised Vn, and the 
+        # squared residuals res_sq = || d - P_Vn d ||^2, which are updated one column per step
+        self.norms = self.DQ = self.res_sq = None
+
+        # In lazy mode we instead keep the orthonormalised Vn, and res_sq[j] is only up to date with 
+        # its first res_k[j] vectors
+        self.lazy = lazy
+        self.gamma = gamma
+        self.n_evals = np.array([], dtype=np.int32)
+        self.Vn_ortho = self.res_k = self._heap = None
+
+        # Screening keeps the (coarse and / or sketched) dot features F_screen of the dictionary, an 
+        # orthonormal basis Q_screen of the features of Vn and the squared residuals in feature space. 
+        # Like the lazy mode it leaves the exact res_sq[j] up to date with only the first res_k[j] vectors
+        # of Vn_ortho. screen_err records the largest error of the screened criterion on each shortlist
+        self.coarse_div = coarse_div
+        self.sketch = sketch
+        self.shortlist = shortlist
+        self.F_screen = self.Q_screen = self.res_sq_screen = self.norms_screen = None
+        self.screen_err = np.array([])
+
+        # The dictionary dots of the picks of the block being added
+        self._block_rows = None
+
+        self._steps_since_checkpoint = 0
+        self.trace = None
 
     @property
     def n(self):
         return self.Vn.n
+
+    @property
+    def _deferred(self):
+        """ Whether the exact residuals are only brought up to date when a candidate is looked at """
+        return self.lazy or self._screened
+
+    @property
+    def _screened(self):
+        return self.coarse_div is not None or self.sketch is not None
     
+    def _criterion(self, idx=None):
+        """ The relative residual || v - P_Vn v || / || v || of the dictionary elements idx (all of them if None) """
+        if self._deferred:
+            raise Exception('{0}: the full criterion is not kept in lazy or screening mode'.format(self.__class__.__name__))
+        if self.res_sq is None:
+            self._init_residuals()
+
+        idx = slice(None) if idx is None else idx
+        return np.sqrt(np.maximum(self.res_sq[idx], 0.0)) / self.norms[idx]
+
+    def _check_independent(self, crit):
+        """ Raise LinearlyDependent if Vn already captures all of the active dictionary """
+        if np.all(np.isclose(crit[self.active], 0.0, atol=_LD_ATOL)):
+            raise LinearlyDependent()
+
+    def _redundant(self, ni, crit):
+        """ Whether dictionary[ni], with current criterion crit, no longer adds anything to Vn """
+        return crit <= _LD_ATOL
+
+    def _add_Vn_vector(self, ni):
+        with _trace_phase(self.trace, 'gram'):
+            self.Vn.add_vector(self.dictionary[ni])
+            self._update_residuals(ni)
+
     def initial_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
         
-        self.norms = np.zeros(len(self.dictionary))
-        for j, v in enumerate(self.dictionary):
-            self.norms[j] = v.norm()
+        if self.res_sq is None:
+            self._init_residuals()
 
-        n0 = np.argmax(self.norms)
+        n0 = self._argmax(self.norms)
         crit = self.norms[n0]
 
-        self.Vn.add_vector(self.dictionary[n0])
+        self._add_Vn_vector(n0)
 
         return n0, crit
  
-
     def next_step_choice(self):
         """ Different greedy methods will have their own maximising/minimising criteria, so all 
         inheritors of this class are expected to overwrite this method to suit their needs. """
     
-        p_V_d = np.zeros(len(self.dictionary))
-        # We go through the dictionary and find the max of perp
-        for j, v in enumerate(self.dictionary):
-            v_perp = (v - self.Vn.project(v)) / v.norm()
-            p_V_d[j] = v_perp.norm()
-        
-        if np.all(np.isclose(p_V_d, 0.0, atol=_LD_ATOL)):
-            raise LinearlyDependent()
-        
-        ni = np.argmax(p_V_d)
-        crit = p_V_d[ni]
+        if self.res_sq is None:
+            self._init_residuals()
+
+        if self.lazy:
+            ni, crit, n_evals = _lazy_argmax(self._heap, self._lazy_evaluate, self.active, self.gamma)
+            self.n_evals = np.append(self.n_evals, n_evals)
+            
+            if ni < 0 or crit <= _LD_ATOL:
+                raise LinearlyDependent()
+        elif self._screened:
+            ni, crit = self._screen_choice()
+        else:
+            p_V_d = self._criterion()
+            self._check_independent(p_V_d)
+            
+            ni = self._argmax(p_V_d)
+            crit = p_V_d[ni]
 
-        self.Vn.add_vector(self.dictionary[ni])
+        self._add_Vn_vector(ni)
         
         # Test linear indpendence
         #lambdas = np.linalg.eigvalsh(self.Vn.G)
@@ -347,55 +1193,315 @@ class GreedyApprox(object):
         #    raise LinearlyDependent()
     
         return ni, crit
-    
-    def construct_to_n(self, n_goal):
+
+    def _init_residuals(self):
+        """ Dictionary norms are computed once, as are the dots against anything already in Vn """
+        self.norms = np.zeros(len(self.dictionary))
+        for j, v in enumerate(self.dictionary):
+            self.norms[j] = v.norm()
+
+        self.DQ = np.zeros((len(self.dictionary), 0))
+        if self.Vn.n > 0:
+            for q in self.Vn.orthonormalise().vecs:
+                dq = np.array([q.dot(v) for v in self.dictionary])
+                self.DQ = np.hstack((self.DQ, dq[:,np.newaxis]))
+        
+        self.res_sq = self.norms ** 2 - (self.DQ ** 2).sum(axis=1)
+
+        if self._deferred:
+            self.Vn_ortho = Basis(list(self.Vn.orthonormalise().vecs), is_orthonormal=True)
+            self.res_k = np.full(len(self.dictionary), self.Vn_ortho.n, dtype=np.int32)
+            self.DQ = None
+
+        if self.lazy:
+            self._heap = [(-p, j) for j, p in enumerate(np.sqrt(np.maximum(self.res_sq, 0.0)) / self.norms)]
+            heapq.heapify(self._heap)
+
+    def _screen_features(self, v):
+        """ The features that v is screened with, which have Euclidean dots approximating those of the 
+            functions (see PWSqDyadic.dot_features and Sketch) """
+        if self.coarse_div is not None:
+            v = v.coarsen(self.coarse_div)
+        if self.sketch is not None:
+            return self.sketch(v)
+        return v.dot_features()
+
+    def _init_screen(self):
+        """ The dictionary is only ever screened through its features, so that screening is a matrix 
+            product rather than a dot product per element """
+        self.F_screen = np.array([self._screen_features(d) for d in self.dictionary])
+        self.Q_screen = np.zeros((self.F_screen.shape[1], 0))
+        self.res_sq_screen = (self.F_screen ** 2).sum(axis=1)
+        self.norms_screen = np.sqrt(self.res_sq_screen)
+        for v in self.Vn.vecs:
+            self._update_screen(v)
+
+    def _update_screen(self, v):
+        """ Gram-Schmidt (twice, for stability) of the features of v against Q_screen """
+        f = self._screen_features(v)
+        f_perp = f - self.Q_screen @ (self.Q_screen.T @ f)
+        f_perp -= self.Q_screen @ (self.Q_screen.T @ f_perp)
+
+        f_perp_norm = np.linalg.norm(f_perp)
+        if f_perp_norm < _LD_ATOL * max(np.linalg.norm(f), 1.0):
+            return
+
+        q = f_perp / f_perp_norm
+        self.Q_screen = np.hstack((self.Q_screen, q[:,np.newaxis]))
+        self.res_sq_screen -= (self.F_screen @ q) ** 2
+
+    def _screen_choice(self):
+        """ Shortlist the candidates with the largest screened relative residual, then bring their exact 
+            residuals up to date and take the best of those. Elements with no coarse features can't be 
+            screened, so are given the largest possible relative residual of 1. This is a heuristic, the 
+            exact greedy choice is only made if it makes the shortlist. """
+        if self.F_screen is None:
+            self._init_screen()
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crit_screen = np.sqrt(np.maximum(self.res_sq_screen, 0.0)) / self.norms_screen
+        crit_screen[self.norms_screen < _LD_ATOL * self.norms] = 1.0
+        crit_screen[~self.active] = -np.inf
+
+        k = min(self.shortlist, self.active.sum())
+        if k == 0:
+            raise LinearlyDependent()
+        # Sorted so that ties are broken by the lowest index, as np.argmax would
+        cand = np.sort(np.argpartition(-crit_screen, k-1)[:k])
+       
+        crit = np.array([self._lazy_evaluate(j)[0] for j in cand])
+        self.screen_err = np.append(self.screen_err, np.abs(crit - crit_screen[cand]).max())
+        i = np.argmax(crit)
+        if crit[i] <= _LD_ATOL:
+            raise LinearlyDependent()
+
+        return cand[i], crit[i]
+
+    def _lazy_evaluate(self, j):
+        """ Bring res_sq[j] up to date with the orthonormalised Vn. The relative residual is both the exact
+            criterion and the bound it keeps in the heap """
+        for q in self.Vn_ortho.vecs[self.res_k[j]:]:
+            self.res_sq[j] -= q.dot(self.dictionary[j]) ** 2
+        self.res_k[j] = self.Vn_ortho.n
+
+        p = math.sqrt(max(self.res_sq[j], 0.0)) / self.norms[j]
+        return p, p
+
+    def _update_residuals(self, ni, g=None):
+        """ When v = dictionary[ni] joins Vn, the new orthonormal direction q = (v - P_Vn v) / || v - P_Vn v ||
+            has dictionary dots (g - DQ DQ[ni]) / || v - P_Vn v ||, with g the dots of v against the 
+            dictionary (computed here unless given), and every squared residual drops by the square of its 
+            dot with q """
+        if self._deferred:
+            # Just the one Gram-Schmidt step in the ambient space, the residuals catch up when evaluated
+            self.Vn_ortho.add_vector(self.dictionary[ni])
+            if self.F_screen is not None:
+                self._update_screen(self.dictionary[ni])
+            return
+
+        if g is None:
+            g = self.dictionary[ni].dots(self.dictionary)
+        a = self.DQ[ni, :]
+
+        v_perp_norm = math.sqrt(max(g[ni] - a @ a, 0.0))
+        if v_perp_norm < _LD_ATOL:
+            return
+
+        dq = (g - self.DQ @ a) / v_perp_norm
+        self.DQ = np.hstack((self.DQ, dq[:,np.newaxis]))
+        self.res_sq -= dq ** 2
+
+    def next_block_choice(self, k, coherence=_BLOCK_COHERENCE):
+        """ Add the top k candidates of the current criterion to Vn in one go, passing over those more 
+            coherent than coherence with one already picked (None turns this off). The first pick is the plain
+            greedy choice, the rest are added without re-scoring the dictionary. Returns the picks, the 
+            criterion each had when it was added and the (stale) criterion it was picked with, the gap between
+            the last two being what the block gave up. Picks that have become redundant are dropped. 
+            
+            Inheritors say how the coherence with the picks is measured (_coherent), how each pick brings the 
+            cached criterion up to date (_add_block_vector) and how the block joins Vn (_end_block). Here the
+            coherence is read off the dictionary dots each pick needs for its residual update anyway, and they
+            also give the new rows of the Grammian of Vn, which grows once for the whole block. """
+        
+        crit = self._criterion()
+        self._check_independent(crit)
+
+        self._block_rows = {}
+        coherent = None if coherence is None else (lambda picks, j: self._coherent(picks, j, coherence))
+        picks = self._select_block(crit, k, coherent, coherence, largest=self._select_largest)
+
+        sel = []
+        sel_crit = []
+        for ni in picks:
+            realised = self._criterion([ni])[0]
+            if len(sel) > 0 and self._redundant(ni, realised):
+                continue
+            self._add_block_vector(ni)
+            sel.append(ni)
+            sel_crit.append(realised)
+
+        self._end_block(sel)
+        self._block_rows = None
+
+        sel = np.array(sel, dtype=np.int32)
+        return sel, np.array(sel_crit), crit[sel]
+
+    def _block_dots(self, j):
+        """ The dots of dictionary[j] against the dictionary, computed once per pick of a block """
+        if j not in self._block_rows:
+            with _trace_phase(self.trace, 'gram'):
+                self._block_rows[j] = self.dictionary[j].dots(self.dictionary)
+        return self._block_rows[j]
+
+    def _coherent(self, picks, j, coherence):
+        """ Whether dictionary[j] is too coherent with any of the picks of a block to join them """
+        dots = np.array([self._block_dots(i)[j] for i in picks])
+        return np.any(np.abs(dots) > coherence * self.norms[picks] * self.norms[j])
+
+    def _add_block_vector(self, ni):
+        """ Bring the cached criterion up to date with a pick of a block, before the next one is looked at """
+        g = self._block_dots(ni)
+        with _trace_phase(self.trace, 'gram'):
+            self._update_residuals(ni, g)
+
+    def _end_block(self, sel):
+        """ Add the picks of a block to Vn together. When all of Vn comes from the dictionary the new rows 
+            of its Grammian are read off the dots of the picks """
+        idx = np.append(self.dict_sel, sel).astype(np.int64)
+        G_rows = None
+        if len(idx) == self.Vn.n + len(sel):
+            G_rows = np.array([self._block_rows[ni][idx] for ni in sel]).reshape(len(sel), len(idx))
+        with _trace_phase(self.trace, 'gram'):
+            self.Vn.add_vectors([self.dictionary[ni] for ni in sel], G_rows)
+
+    def save_checkpoint(self, file_name):
+        """ Save the selections, criteria, active mask, cached residuals and the Grammian of Vn to a
+            compressed npz file """
+        state = _checkpoint_state(self, self._checkpoint_attrs)
+        state['n_given'] = self.Vn.n - len(self.dict_sel)
+        if self.Vn.G is not None:
+            state['Vn_G'] = self.Vn.G
+        _save_checkpoint(file_name, state)
+
+    def load_checkpoint(self, file_name):
+        """ Carry on from a checkpoint made by a run with the same dictionary and starting Vn. The
+            selected elements are added back to Vn without computing any dot products, and none of the
+            earlier steps are redone. Returns the loaded data """
+        data = np.load(file_name)
+
+        n_given = int(data['n_given'])
+        if self.Vn.n != n_given:
+            raise Exception('{0}: the checkpoint started from a Vn with {1} elements, not {2}'.format(self.__class__.__name__, n_given, self.Vn.n))
+
+        _restore_state(self, data, self._checkpoint_attrs)
+        
+        if not self.Vn.is_orthonormal:
+            self.Vn.G = None
+        for ni in self.dict_sel:
+            self.Vn.add_vector(self.dictionary[ni])
+        if 'Vn_G' in data:
+            self.Vn.G = data['Vn_G']
+
+        if self._deferred and self.res_sq is not None:
+            self.Vn_ortho = Basis(list(self.Vn.orthonormalise().vecs), is_orthonormal=True)
+            self.DQ = None
+        # The screening features are cheap to rebuild for the restored Vn
+        self.F_screen = None
+
+        return data
+
+    def _trace_beta(self):
+        """ The measurement based methods compute beta at each step anyway, so it goes in the trace """
+        if hasattr(self, 'beta') and self.n <= len(self.beta):
+            return self.beta[self.n-1]
+        return np.nan
+
+    def construct_to_n(self, n_goal, block=1, coherence=_BLOCK_COHERENCE, checkpoint=None, checkpoint_every=1):
+        """ Greedily add to Vn until it has n_goal elements, block elements at a time if block > 1 
+            (see next_block_choice). If a checkpoint file name is given the state is saved there every 
+            checkpoint_every steps (or blocks) and at the end, see load_checkpoint """
          
         if self.verbose:
             print('i \t Selection \t Sel. criteria')
         
+        if self.trace is not None:
+            self.trace.start_step()
+
         if self.Vn.n == 0:
-            n0, crit = self.initial_choice()
+            with _trace_phase(self.trace, 'score'):
+                n0, crit = self.initial_choice()
 
             self.dict_sel = np.append(self.dict_sel, n0) 
             self.sel_crit = np.append(self.sel_crit, crit)
+            self.block_crit = np.append(self.block_crit, crit)
 
             if self.remove:
-                del self.dictionary[n0]
+                self.active[n0] = False
             
             if self.verbose:
                 print('{0} : \t {1} \t {2}'.format(self.Vn.n, n0, crit))
 
+            if self.trace is not None:
+                self.trace.end_step(n0, crit, beta=self._trace_beta())
+
         try: 
             while self.Vn.n < n_goal:
                 
-                ni, crit = self.next_step_choice()
+                with _trace_phase(self.trace, 'score'):
+                    if block > 1:
+                        sel, crit, block_crit = self.next_block_choice(min(block, n_goal - self.Vn.n), coherence)
+                    else:
+                        ni, c = self.next_step_choice()
+                        sel, crit, block_crit = np.array([ni]), np.array([c]), np.array([c])
                 
-                self.dict_sel = np.append(self.dict_sel, ni) 
+                self.dict_sel = np.append(self.dict_sel, sel) 
                 self.sel_crit = np.append(self.sel_crit, crit)
+                self.block_crit = np.append(self.block_crit, block_crit)
 
                 if self.remove:
-                    del self.dictionary[ni]
+                    self.active[sel] = False
                 
                 if self.verbose:
-                    print('{0} : \t {1} \t\t {2}'.format(self.Vn.n, ni, crit))
+                    for ni, c in zip(sel, crit):
+                        print('{0} : \t {1} \t\t {2}'.format(self.Vn.n, ni, c))
+
+                if self.trace is not None:
+                    self.trace.end_step(sel[0], crit[0], beta=self._trace_beta(), n_added=len(sel))
+
+                self._step_checkpoint(checkpoint, checkpoint_every)
 
         except LinearlyDependent:
             print('Vn spans all dictionary points at n={0}, stopping greedy'.format(self.n))
 
+        if checkpoint is not None:
+            self.save_checkpoint(checkpoint)
+
         if self.verbose:
             print('Done!')
         
         return self.Vn
 
-class MeasBasedGreedy(GreedyApprox):
-    """ Measurement based greedy algorithm """ 
-    def __init__(self, dictionary, u, Wm, Vn=None, verbose=False, remove=False):
+class _MeasBasedApprox(GreedyApprox):
+    """ What the measurement based greedy algorithms share. The dictionary is only looked at through its 
+        measurements Wdict, a row per element in the coordinates of the orthonormal Wm, so that ambient space 
+        vectors are only touched to build Vn. Inheritors say how the measurements Zn of the selected elements 
+        are kept (_reset_Zn and _add_Zn_column), what the dictionary is scored against (_query) and how 
+        (_scores, along with the matching _shard_kernel) """
+
+    _checkpoint_attrs = GreedyApprox._checkpoint_attrs + ['beta']
+
+    # Whether each row of Wdict is normalised
+    _normalise_Wdict = False
+    # The ShardPool kernel that finds the best candidate of a shard by _scores
+    _shard_kernel = staticmethod(_shard_abs_dot)
+
+    def __init__(self, dictionary, u, Wm, Vn=None, verbose=False, remove=False, processes=None):
  
         if not Wm.is_orthonormal:
             raise Exception('Need orthonormal Wm for greedy approx construction')
 
         self.Wm = Wm
-        self.w = self.Wm.project(u)
+        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True)
 
         self.BP = None
         self.beta = np.zeros(self.m)
@@ -405,268 +1511,432 @@ class MeasBasedGreedy(GreedyApprox):
         self.Wdict = np.zeros((len(dictionary), self.m))
         for i, v in enumerate(dictionary):
             self.Wdict[i, :] = self.Wm.dot(v)
+            if self._normalise_Wdict:
+                self.Wdict[i, :] /= np.linalg.norm(self.Wdict[i,:]) # NOTE - Should normalise here
+        self.Wdict_norms = np.linalg.norm(self.Wdict, axis=1)
+
+        # An optional ShardPool to scan Wdict in parallel
+        self.shards = None
+        if processes is not None:
+            self.shards = ShardPool(len(self.dictionary), processes)
+            self.Wdict = self.shards.share('Wdict', self.Wdict)
+            self.active = self.shards.share('active', self.active)
+
+        self._reset_Zn()
 
     @property
     def m(self):
         return self.Wm.n
-    
-    def reset_u(self, u):
-        if self.remove:
-            warnings.warn('Resetting greedy constructor with dictionary removal - \
-                           dictionary is of length {0}'.format(len(self.dictionary)))
 
-        # This is to reset with a new u but same dictionary dots, save lots of time...
-        self.w = self.Wm.project(u)
+    def _reset_Zn(self):
+        pass
+
+    def _add_Zn_column(self, ni):
+        pass
+
+    def _query(self):
+        """ The vector in measurement coordinates that the dictionary is scored against """
+        pass
+
+    def _scores(self, idx, q):
+        """ The criterion of the dictionary elements idx against the query q """
+        return np.abs(self.Wdict[idx] @ q)
+
+    def _criterion(self, idx=None):
+        idx = slice(None) if idx is None else idx
+        return self._scores(idx, self._query())
+
+    def _initial_criterion(self):
+        return np.abs(self.Wdict @ self.w_coeffs)
+
+    def reset_u(self, u):
+        # This is to reset with a new u but same dictionary dots, save lots of time... and as removal
+        # only masks the dictionary, we get the whole dictionary back too
+        self.active[:] = True
+        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True)
         self.Vn = type(self.Vn)()
         self.Vn.make_grammian()
         self.BP = None
         self.beta = np.zeros(self.m)
+        self._reset_Zn()
 
         self.sel_crit = np.array([])
+        self.block_crit = np.array([])
         self.dict_sel = np.array([], dtype=np.int32)
 
-    def construct_to_n(self, n_goal):
+    def construct_to_n(self, n_goal, block=1, coherence=_BLOCK_COHERENCE, checkpoint=None, checkpoint_every=1):
 
         self.beta.resize(n_goal)
-        super().construct_to_n(n_goal)
+        super().construct_to_n(n_goal, block=block, coherence=coherence, checkpoint=checkpoint, checkpoint_every=checkpoint_every)
 
         return self.Vn
 
-    def initial_choice(self):
+    def load_checkpoint(self, file_name):
+        data = super().load_checkpoint(file_name)
+        if 'BP_CG' in data:
+            self.BP = BasisPair(self.Wm, self.Vn.orthonormalise(), CG=data['BP_CG'])
+        return data
+
+    def next_block_choice(self, k, coherence=_BLOCK_COHERENCE):
+        n0 = self.n
+        sel, crit, block_crit = super().next_block_choice(k, coherence)
+
+        # beta is only computed at the end of each block
+        self.beta[n0:self.n-1] = np.nan
+        with _trace_phase(self.trace, 'svd', solves=1):
+            self.beta[self.n-1] = self.BP.beta()
+
+        return sel, crit, block_crit
+
+    def _add_Vn_vector(self, ni):
+        with _trace_phase(self.trace, 'gram'):
+            self.Vn.add_vector(self.dictionary[ni])
+            self.BP.add_Vn_vector(self.dictionary[ni])
+        with _trace_phase(self.trace, 'ortho'):
+            self._add_Zn_column(ni)
+        self._deactivate(ni)
+
+    def _coherent(self, picks, j, coherence):
+        """ Here the coherence is that of the measurements, the rows of Wdict, which is all the criteria see """
+        dots = self.Wdict[picks] @ self.Wdict[j]
+        return np.any(np.abs(dots) > coherence * self.Wdict_norms[picks] * self.Wdict_norms[j])
+
+    def _add_block_vector(self, ni):
+        """ The picks of a block go into Vn (whose Grammian MeasBasedGreedy scores with) and Zn one at a time,
+            and into the BasisPair together at the end of the block """
+        with _trace_phase(self.trace, 'gram'):
+            self.Vn.add_vector(self.dictionary[ni])
+        with _trace_phase(self.trace, 'ortho'):
+            self._add_Zn_column(ni)
+        self._deactivate(ni)
+
+    def _end_block(self, sel):
+        with _trace_phase(self.trace, 'gram'):
+            self.BP.add_Vn_vectors([self.dictionary[ni] for ni in sel])
+
+    def _deactivate(self, ni):
+        """ An element already in Vn is never a candidate again, whatever remove is, as the criterion need 
+            not vanish on it (it doesn't for MeasBasedGreedy) and choosing it twice makes the Grammian of Vn
+            singular """
+        self.active[ni] = False
 
-        self.norms = np.linalg.norm(self.Wdict, axis=1)
+    def initial_choice(self):
 
-        n0 = np.argmax(self.norms)
-        crit = self.norms[n0]
+        p_V_d = self._initial_criterion()
+        n0 = self._argmax(p_V_d)
+        crit = p_V_d[n0]
 
-        self.Vn.add_vector(self.dictionary[n0])
+        # There is no BasisPair to add to yet, so this is _add_Vn_vector without it
+        with _trace_phase(self.trace, 'gram'):
+            self.Vn.add_vector(self.dictionary[n0])
+        with _trace_phase(self.trace, 'ortho'):
+            self._add_Zn_column(n0)
+        self._deactivate(n0)
 
         if self.BP is None or self.BP.Vn is not self.Vn.orthonormal_basis:
-            self.BP = BasisPair(self.Wm, self.Vn.orthonormalise())
-        self.beta[self.n - 1] = self.BP.beta()
+            with _trace_phase(self.trace, 'ortho'):
+                self.BP = BasisPair(self.Wm, self.Vn.orthonormalise())
+        with _trace_phase(self.trace, 'svd', solves=1):
+            self.beta[self.n-1] = self.BP.beta()
     
-        if self.remove:
-            self.Wdict = np.delete(self.Wdict, (n0), axis=0)
-
         return n0, crit
 
-    def next_step_choice(self):
-        """ Different greedy methods will have their own maximising/minimising criteria, so all 
-        inheritors of this class are expected to overwrite this method to suit their needs. """
- 
-        p_V_d = np.zeros(len(self.dictionary))
-        
-        w_perp = self.w - self.Vn.project(self.w)
-        # We go through the dictionary and find the max of 
-        for j, v in enumerate(self.dictionary):
-            p_V_d[j] = np.abs(w_perp.dot(v))
-        
-        if np.all(np.isclose(p_V_d, 0.0, atol=_LD_ATOL)):
+    def _best(self, q):
+        """ The best active candidate against the query q, found with the shards if we have them, and 
+            otherwise with a full scan """
+        if not self.active.any():
             raise LinearlyDependent()
 
-        ni = np.argmax(p_V_d)
-        crit = p_V_d[ni]
-        
-        self.Vn.add_vector(self.dictionary[ni])
-        
-        # Test linear indpendence
-        #lambdas = np.linalg.eigvalsh(self.Vn.G)
-        #if np.any(np.isclose(lambdas, 0.0, atol=1e-10)):
-        #    raise LinearlyDependent()
- 
-        self.BP.add_Vn_vector(self.dictionary[ni])
-        self.beta[self.n-1] = self.BP.beta()
+        if self.shards is not None:
+            ni, crit = self.shards.best(self._shard_kernel, q, largest=self._select_largest)
+            if ni < 0 or crit <= _LD_ATOL:
+                raise LinearlyDependent()
+            return ni, crit
 
-        if self.remove:
-            self.Wdict = np.delete(self.Wdict, (ni), axis=0)
+        p_V_d = self._scores(slice(None), q)
+        self._check_independent(p_V_d)
 
-        return ni, crit
+        if self._select_largest:
+            ni = self._argmax(p_V_d)
+        else:
+            ni = np.argmin(np.where(self.active, p_V_d, np.inf))
+        return ni, p_V_d[ni]
 
-class MeasBasedOMP(GreedyApprox):
-    """ Measurement based greedy orthogonal matching pursuit """ 
+    def next_step_choice(self):
+        """ Different greedy methods will have their own maximising/minimising criteria, so all 
+        inheritors of this class are expected to overwrite this method to suit their needs. """
 
-    def __init__(self, dictionary, u, Wm, Vn=None, verbose=False, remove=False):
- 
-        if not Wm.is_orthonormal:
-            raise Exception('Need orthonormal Wm for greedy approx construction')
+        ni, crit = self._best(self._query())
 
-        self.Wm = Wm
-        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True)
+        self._add_Vn_vector(ni)
+        with _trace_phase(self.trace, 'svd', solves=1):
+            self.beta[self.n-1] = self.BP.beta()
 
-        self.BP = None
-        self.beta = np.zeros(self.m)
+        return ni, crit
 
-        super().__init__(dictionary, Vn=Vn, verbose=verbose, remove=remove)
+class MeasBasedGreedy(_MeasBasedApprox):
+    """ Measurement based greedy algorithm """ 
 
-        self.Wdict = np.zeros((len(dictionary), self.m))
-        for i, v in enumerate(dictionary):
-            self.Wdict[i, :] = self.Wm.dot(v)
-            self.Wdict[i, :] /= np.linalg.norm(self.Wdict[i,:]) # NOTE - Should normalise here
+    _checkpoint_attrs = _MeasBasedApprox._checkpoint_attrs + ['Zn', 'Vn_w']
 
-        self.Zn = None
+    def _reset_Zn(self):
+        """ Zn holds the measurements of the selected dictionary elements, and Vn_w their dots with w,
+            which we know exactly from the measurements as w lies in the span of the orthonormal Wm """
+        self.Zn = np.zeros((self.m, 0))
+        self.Vn_w = np.zeros(0)
 
-    @property
-    def m(self):
-        return self.Wm.n
- 
-    def reset_u(self, u):
-        if self.remove:
-            warnings.warn('Resetting greedy constructor with dictionary removal - \
-                           dictionary is of length {0}'.format(len(self.dictionary)))
+    def _add_Zn_column(self, ni):
+        self.Zn = np.hstack((self.Zn, self.Wdict[ni, :][:,np.newaxis]))
+        self.Vn_w = np.append(self.Vn_w, self.Wdict[ni, :] @ self.w_coeffs)
 
-        # This is to reset with a new u but same dictionary dots, save lots of time...
-        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True)
-        self.Vn = type(self.Vn)()
-        self.Vn.make_grammian()
-        self.BP = None
-        self.beta = np.zeros(self.m)
+    def _initial_criterion(self):
+        self.norms = np.linalg.norm(self.Wdict, axis=1)
+        return self.norms
+
+    def _w_perp(self):
+        """ The coefficients c of P_Vn w come from the Vn Grammian and the measured dots Vn_w, and then 
+            Zn c are the measurements of P_Vn w """
+        if self.trace is not None:
+            self.trace.count_solve()
+        try:
+            c = np.linalg.solve(self.Vn.G, self.Vn_w)
+        except np.linalg.LinAlgError:
+            raise LinearlyDependent()
+        return self.w_coeffs - self.Zn @ c
 
-        self.sel_crit = np.array([])
-        self.dict_sel = np.array([], dtype=np.int32)
+    def _query(self):
+        """ The criterion is | < w - P_Vn w, P_Wm v > |, evaluated in measurement coordinates """
+        return self._w_perp()
 
-    def construct_to_n(self, n_goal):
+class MeasBasedOMP(_MeasBasedApprox):
+    """ Measurement based greedy orthogonal matching pursuit """ 
 
-        self.beta.resize(n_goal)
-        super().construct_to_n(n_goal)
+    _checkpoint_attrs = _MeasBasedApprox._checkpoint_attrs + ['Zn_Q', 'Zn_R', 'Zn_k', 'w_perp']
+    _normalise_Wdict = True
 
-        return self.Vn
+    @property
+    def Zn(self):
+        """ The measurements of the selected dictionary elements, which we only keep as a QR factorisation """
+        return self.Zn_Q[:, :self.Zn_k] @ self.Zn_R[:self.Zn_k, :self.Zn_k]
+
+    def _reset_Zn(self):
+        """ Pre-allocated thin QR factors of Zn, and the OMP residual w_perp = w - P_Zn w """
+        self.Zn_Q = np.zeros((self.m, self.m))
+        self.Zn_R = np.zeros((self.m, self.m))
+        self.Zn_k = 0
+
+        self.w_perp = self.w_coeffs.copy()
+
+    def _add_Zn_column(self, ni):
+        z_perp_norm = _qr_add_column(self.Zn_Q, self.Zn_R, self.Zn_k, self.Wdict[ni, :])
+        if z_perp_norm < _LD_ATOL:
+            return
+        
+        q = self.Zn_Q[:, self.Zn_k]
+        self.Zn_k += 1
 
-    def initial_choice(self):
+        self.w_perp -= (q @ self.w_perp) * q
 
-        p_V_d = np.abs(np.dot(self.w_coeffs, self.Wdict.T))
-        n0 = np.argmax(p_V_d)
-        crit = p_V_d[n0]
+    def _query(self):
+        return self.w_perp
 
-        self.Vn.add_vector(self.dictionary[n0])
-        self.Zn = self.Wdict[n0,:][:,np.newaxis]
+class MeasBasedPP(MeasBasedOMP):
+    """ Measurement based greedy orthogonal matching pursuit """ 
 
-        if self.BP is None or self.BP.Vn is not self.Vn.orthonormal_basis:
-            self.BP = BasisPair(self.Wm, self.Vn.orthonormalise())
-        self.beta[self.n - 1] = self.BP.beta()
-    
-        if self.remove:
-            self.Wdict = np.delete(self.Wdict, (n0), axis=0)
+    _select_largest = False
+    _checkpoint_attrs = MeasBasedOMP._checkpoint_attrs + ['z_perp_sq']
+    _shard_kernel = staticmethod(_shard_pp)
 
-        return n0, crit
+    def _reset_Zn(self):
+        """ Pre-allocated thin QR factors of Zn, along with the residual of the measurement w_perp 
+            and the squared norms of the dictionary measurements orthogonal to Zn """
+        super()._reset_Zn()
 
-    def next_step_choice(self):
-        """ Different greedy methods will have their own maximising/minimising criteria, so all 
-        inheritors of this class are expected to overwrite this method to suit their needs. """
-        
-        w_perp =  self.w_coeffs - np.linalg.lstsq(self.Zn, self.w_coeffs, rcond=None)[0] @ self.Zn.T
-        
-        p_V_d = np.abs(np.dot(w_perp, self.Wdict.T)) #self.Wm.dot(v_perp)))
+        self.z_perp_sq = (self.Wdict ** 2).sum(axis=1)
+        if self.shards is not None:
+            self.z_perp_sq = self.shards.share('z_perp_sq', self.z_perp_sq)
 
-        if np.all(np.isclose(p_V_d, 0.0, atol=_LD_ATOL)):
-            raise LinearlyDependent()
+    def _add_Zn_column(self, ni):
+        k = self.Zn_k
+        super()._add_Zn_column(ni)
+        if self.Zn_k == k:
+            return
 
-        ni = np.argmax(p_V_d)
-        crit = p_V_d[ni]
+        q = self.Zn_Q[:, k]
+        if self.shards is not None:
+            self.shards.map(_shard_pp_update, q)
+        else:
+            self.z_perp_sq -= (self.Wdict @ q) ** 2
 
-        self.Vn.add_vector(self.dictionary[ni])
-        self.Zn = np.hstack((self.Zn, self.Wdict[ni, :][:,np.newaxis]))
-        
-        self.BP.add_Vn_vector(self.dictionary[ni])
-        self.beta[self.n-1] = self.BP.beta()
+    def _scores(self, idx, q):
+        return _pp_criterion(self.Wdict[idx], self.z_perp_sq[idx], q)
 
-        if self.remove:
-            self.Wdict = np.delete(self.Wdict, (ni), axis=0)
+    def _check_independent(self, crit):
+        if np.any(np.isclose(crit[self.active], 0.0, atol=_LD_ATOL)):
+            raise LinearlyDependent()
 
-        return ni, crit
+    def _redundant(self, ni, crit):
+        return self.z_perp_sq[ni] < _LD_ATOL * _LD_ATOL
 
-class MeasBasedPP(GreedyApprox):
-    """ Measurement based greedy orthogonal matching pursuit """ 
+class MeasBasedBatchOMP(object):
+    """ Measurement based greedy orthogonal matching pursuit, run for a whole batch of snapshots 
+        at once. W is a matrix of measurement coefficients with one column per snapshot u, i.e. 
+        W[:, s] = Wm.dot(u_s), and each step scores every candidate for every snapshot with one
+        product Wdict @ W_perp. Each snapshot keeps its own QR factorisation of Zn, and the factor
+        Vn_L_inv such that its orthonormal Vn is reconstructed from the selected dictionary 
+        elements with the coefficients Vn_L_inv[s, :n, :n], which also gives the beta curve """ 
 
-    def __init__(self, dictionary, u, Wm, Vn=None, verbose=False, remove=False):
+    def __init__(self, dictionary, W, Wm, Vn=None, Wdict=None, verbose=False, remove=False):
  
         if not Wm.is_orthonormal:
             raise Exception('Need orthonormal Wm for greedy approx construction')
 
+        self.dictionary = dictionary
         self.Wm = Wm
-        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True) 
+        self.W = W
+        self.Vn = Vn or Basis()
 
-        self.BP = None
-        self.beta = np.zeros(self.m)
+        self.verbose = verbose
+        self.remove = remove
 
-        super().__init__(dictionary, Vn=Vn, verbose=verbose, remove=remove)
+        # We allow the (un-normalised) dictionary measurements to be shared with another algorithm
+        if Wdict is None:
+            Wdict = np.zeros((len(dictionary), self.m))
+            for i, v in enumerate(dictionary):
+                Wdict[i, :] = self.Wm.dot(v)
+        self.Wdict_norms = np.linalg.norm(Wdict, axis=1)
+        self.Wdict = Wdict / self.Wdict_norms[:,np.newaxis]
 
-        self.Wdict = np.zeros((len(dictionary), self.m))
-        for i, v in enumerate(dictionary):
-            self.Wdict[i, :] = self.Wm.dot(v)
-            self.Wdict[i, :] /= np.linalg.norm(self.Wdict[i,:]) # NOTE - Should normalise here
+        # Dots between selected dictionary elements, shared between snapshots
+        self._dots = {}
 
-        self.Zn = None
+        self.reset_W(W)
 
     @property
     def m(self):
         return self.Wm.n
- 
-    def reset_u(self, u):
-        if self.remove:
-            warnings.warn('Resetting greedy constructor with dictionary removal - \
-                           dictionary is of length {0}'.format(len(self.dictionary)))
 
-        # This is to reset with a new u but same dictionary dots, save lots of time...
-        self.w, self.w_coeffs = self.Wm.project(u, return_coeffs=True)
-        self.Vn = type(self.Vn)()
-        self.Vn.make_grammian()
-        self.BP = None
-        self.beta = np.zeros(self.m)
+    @property
+    def S(self):
+        return self.W.shape[1]
 
-        self.sel_crit = np.array([])
-        self.dict_sel = np.array([], dtype=np.int32)
+    def reset_W(self, W):
+        """ Start again with a new batch of measurements but the same dictionary measurements """
+        if W.shape[0] != self.m:
+            raise Exception('W must have {0} rows, one for each measurement in Wm'.format(self.m))
 
-    def construct_to_n(self, n_goal):
+        self.W = W
+        self.W_perp = W.copy()
+        self.n = 0
+        
+        self.active = np.ones((self.S, len(self.dictionary)), dtype=bool)
+        self.done = np.zeros(self.S, dtype=bool)
+        self.n_sel = np.zeros(self.S, dtype=np.int32)
 
-        self.beta.resize(n_goal)
-        super().construct_to_n(n_goal)
+        self.dict_sel = np.zeros((self.S, 0), dtype=np.int32)
+        self.sel_crit = np.zeros((self.S, 0))
+        self.beta = np.zeros((self.S, 0))
 
-        return self.Vn
+        self.Zn_Q = np.zeros((self.S, self.m, self.m))
+        self.Zn_R = np.zeros((self.S, self.m, self.m))
+        self.Vn_L_inv = np.zeros((self.S, self.m, self.m))
+        self.CG = np.zeros((self.S, self.m, self.m))
 
-    def initial_choice(self):
+    def _dict_dot(self, i, j):
+        key = (min(i, j), max(i, j))
+        if key not in self._dots:
+            self._dots[key] = self.dictionary[i].dot(self.dictionary[j])
+        return self._dots[key]
 
-        p_V_d = np.abs(np.dot(self.w_coeffs, self.Wdict.T))
-        n0 = np.argmax(p_V_d)
-        crit = p_V_d[n0]
+    def construct_to_n(self, n_goal):
+        
+        if self.verbose:
+            print('i \t Snapshots \t Mean sel. criteria')
 
-        self.Vn.add_vector(self.dictionary[n0])
-        self.Zn = self.Wdict[n0,:][:,np.newaxis]
+        n_goal = min(n_goal, self.m)
+        pad = max(n_goal - self.dict_sel.shape[1], 0)
+        self.dict_sel = np.pad(self.dict_sel, ((0,0),(0,pad)), 'constant', constant_values=-1)
+        self.sel_crit = np.pad(self.sel_crit, ((0,0),(0,pad)), 'constant')
+        self.beta = np.pad(self.beta, ((0,0),(0,pad)), 'constant')
 
-        if self.BP is None or self.BP.Vn is not self.Vn.orthonormal_basis:
-            self.BP = BasisPair(self.Wm, self.Vn.orthonormalise())
-        self.beta[self.n - 1] = self.BP.beta()
-    
-        if self.remove:
-            self.Wdict = np.delete(self.Wdict, (n0), axis=0)
+        while self.n < n_goal and not self.done.all():
+            self.next_step_choice()
+            
+        if self.verbose:
+            print('Done!')
 
-        return n0, crit
+        return self.dict_sel
 
     def next_step_choice(self):
-        """ Different greedy methods will have their own maximising/minimising criteria, so all 
-        inheritors of this class are expected to overwrite this method to suit their needs. """
-        
-        p_V_d = np.zeros(len(self.dictionary))
-        
-        for j, z in enumerate(self.Wdict):
-            Zn_ext =  np.hstack((self.Zn, z[:,np.newaxis]))
-            w_perp = self.w_coeffs - np.linalg.lstsq(Zn_ext, self.w_coeffs, rcond=None)[0] @ Zn_ext.T
-            p_V_d[j] = np.linalg.norm(w_perp)
-       
-        if np.any(np.isclose(p_V_d, 0.0, atol=_LD_ATOL)):
-            raise LinearlyDependent()
+        """ One OMP step for all snapshots that haven't yet spanned their measurements """
+        k = self.n
 
-        ni = np.argmin(p_V_d)
-        crit = p_V_d[ni]
+        p_V_d = np.abs(self.Wdict @ self.W_perp).T
+        p_V_d[~self.active] = -np.inf
 
-        self.Vn.add_vector(self.dictionary[ni])
-        self.Zn = np.hstack((self.Zn, self.Wdict[ni, :][:,np.newaxis]))
-        
-        self.BP.add_Vn_vector(self.dictionary[ni])
-        self.beta[self.n-1] = self.BP.beta()
+        # A snapshot is finished once its residual is orthogonal to every remaining candidate
+        self.done |= np.all(np.isclose(np.where(self.active, p_V_d, 0.0), 0.0, atol=_LD_ATOL), axis=1)
+        act = np.flatnonzero(~self.done)
+        if act.size == 0:
+            return
 
+        ni = np.argmax(p_V_d[act], axis=1)
+        self.dict_sel[act, k] = ni
+        self.sel_crit[act, k] = p_V_d[act, ni]
         if self.remove:
-            self.Wdict = np.delete(self.Wdict, (ni), axis=0)
-
-        return ni, crit
-
-
+            self.active[act, ni] = False
+
+        # The Gram-Schmidt step (with one re-orthogonalisation) for every QR of Zn at once. All the 
+        # unfinished snapshots have exactly k columns, as OMP never picks a candidate in the span of Zn
+        Q = self.Zn_Q[act, :, :k]
+        z = self.Wdict[ni, :]
+        r = np.einsum('amk,am->ak', Q, z)
+        z_perp = z - np.einsum('amk,ak->am', Q, r)
+        r_corr = np.einsum('amk,am->ak', Q, z_perp)
+        z_perp -= np.einsum('amk,ak->am', Q, r_corr)
+        z_perp_norm = np.linalg.norm(z_perp, axis=1)
+        
+        q = z_perp / z_perp_norm[:,np.newaxis]
+        self.Zn_Q[act, :, k] = q
+        self.Zn_R[act, :k, k] = r + r_corr
+        self.Zn_R[act, k, k] = z_perp_norm
+        self.W_perp[:, act] -= q.T * np.einsum('am,ma->a', q, self.W_perp[:, act])
+
+        # And the same step for the orthonormalisation of each Vn, which needs the dots of the new 
+        # element with the previously selected ones, and gives the Wm x Vn cross-grammian for beta
+        g = np.zeros((act.size, k))
+        g_self = np.zeros(act.size)
+        for a, s in enumerate(act):
+            g[a] = [self._dict_dot(ni[a], j) for j in self.dict_sel[s, :k]]
+            g_self[a] = self._dict_dot(ni[a], ni[a])
+
+        L_inv = self.Vn_L_inv[act, :k, :k]
+        c = np.einsum('akj,ak->aj', L_inv, g)
+        v_perp_norm = np.sqrt(np.maximum(g_self - (c * c).sum(axis=1), 0.0))
+
+        self.Vn_L_inv[act, :k, k] = -np.einsum('akj,aj->ak', L_inv, c) / v_perp_norm[:,np.newaxis]
+        self.Vn_L_inv[act, k, k] = 1.0 / v_perp_norm
+        z_raw = self.Wdict[ni, :] * self.Wdict_norms[ni,np.newaxis]
+        self.CG[act, :, k] = (z_raw - np.einsum('amk,ak->am', self.CG[act, :, :k], c)) / v_perp_norm[:,np.newaxis]
+
+        if self.m >= k + 1:
+            self.beta[act, k] = np.linalg.svd(self.CG[act, :, :k+1], compute_uv=False)[:, -1]
+
+        self.n_sel[act] += 1
+        self.n += 1
+        
+        if self.verbose:
+            print('{0} : \t {1} \t\t {2}'.format(self.n, act.size, self.sel_crit[act, k].mean()))
+
+    def Vn_basis(self, s):
+        """ The basis selected for snapshot s, with its Grammian filled in from the cached dots """
+        sel = self.dict_sel[s, :self.n_sel[s]]
+        Vn = type(self.Vn)([self.dictionary[i] for i in sel])
+        Vn.G = np.array([[self._dict_dot(i, j) for j in sel] for i in sel])
+        return Vn
+
+    def Vn_coeffs(self, s):
+        """ Coefficients of the orthogonal projection of the measurements of snapshot s onto its Zn, 
+            in terms of the selected dictionary elements (as normalised in Wdict) """
+        k = self.n_sel[s]
+        return scipy.linalg.solve_triangular(self.Zn_R[s, :k, :k], self.Zn_Q[s, :, :k].T @ self.W[:, s])
@@ -16,7 +16,7 @@ from pyApproxTools.vector import *
 from pyApproxTools.basis import *
 from pyApproxTools.pw_vector import *
 
-__all__ = ['PWBasis']
+__all__ = ['PWBasis', 'Sketch']
 
 class PWBasis(Basis):
     """  A basis that knows about the PW nature of the vectors, and stores them in a flat array, for speed """
@@ -59,7 +59,7 @@ class PWBasis(Basis):
             self.values_flat = np.pad(self.values_flat, ((0,0),(0,0),(0,self.n-self.values_flat.shape[2])), 'constant')
             self.values_flat[:,:,self.n-1] = self.vecs[-1].values
         else:
-            self.values_flat = self.vecs[-1].values[:,:,np.newaxis]
+            self.values_flat = self.vecs[-1].values[:,:,np.newaxis].copy()
 
 
     def subspace(self, indices):
@@ -76,7 +76,7 @@ class PWBasis(Basis):
 
     def reconstruct(self, c):
         """ Build a function from a vector of coefficients """
-        u_p = type(self.vecs[0])((c * self.values_flat[:,:,:self.n]).sum(axis=2)) 
+        u_p = type(self.vecs[0])._trusted(self.values_flat[:,:,:self.n] @ np.asarray(c, dtype=float), self.vecs[0].div)
         return u_p
 
     def save(self, file_name):
@@ -112,3 +112,49 @@ class PWBasis(Basis):
         else:
             self.S = self.U = self.V = None
 
+class Sketch(object):
+    """ A Gaussian random embedding S of the dot features of dyadic functions (see PWSqDyadic.dot_features) 
+        into R^k, so that < S f(u), S f(v) > approximates < u, v >. The matrix is drawn the first time it is 
+        applied, with the seed if one is given, and is then fixed. By the Johnson-Lindenstrauss lemma the 
+        squared norms of any n given functions are kept to within a factor of (1 +- epsilon) with probability
+        1 - delta (see epsilon), so k trades accuracy against the cost of working with the features """
+
+    def __init__(self, k, seed=None):
+        self.k = k
+        self.seed = seed
+        self.S = None
+
+    def __call__(self, v):
+        f = v.dot_features()
+        if self.S is None:
+            rng = np.random.RandomState(self.seed)
+            self.S = rng.standard_normal((self.k, len(f))) / np.sqrt(self.k)
+        elif self.S.shape[1] != len(f):
+            raise Exception('{0}: all sketched functions must be on the same grid'.format(self.__class__.__name__))
+        return self.S @ f
+
+    def features(self, vecs):
+        """ The sketched features of each of the vecs, as rows """
+        return np.array([self(v) for v in vecs])
+
+    def grammian(self, vecs):
+        """ The approximate Grammian of the vecs """
+        F = self.features(vecs)
+        return F @ F.T
+
+    def norms(self, vecs):
+        return np.linalg.norm(self.features(vecs), axis=1)
+
+    def epsilon(self, n, delta=0.01, dots=False):
+        """ A distortion that holds for the squared norms of n functions with probability at least 1 - delta, 
+            from P( | || S x ||^2 - || x ||^2 | > eps || x ||^2 ) <= 2 exp(-k eps^2 / 8) for eps < 1/2. With
+            dots=True it holds for | < S u, S v > - < u, v > | / || u || || v || between all of them, through
+            the norms of their sums and differences. 
+            
+            The tail bound only holds for eps < 1/2, which needs k >= 32 ln(2n / delta) rows (n(n+1) in place
+            of n with dots=True), e.g. k >= 317 for n = 100 and delta = 0.01. For smaller sketches there is no 
+            guarantee at all, and we return inf rather than a number that looks like one """
+        if dots:
+            n = n * (n + 1)
+        eps = np.sqrt(8 * np.log(2 * n / delta) / self.k)
+        return eps if eps < 0.5 else np.inf
@@ -43,7 +43,7 @@ class DyadicFEMSolver(object):
         self.h = 1.0 / (self.n_side + 1)
 
         # Makes an appropriate sized field for our FEM grid
-        a = rand_field.interpolate(self.div).values
+        a = rand_field.cell_values(self.div)
         
         # Now we make the various diagonals
         diag = 2.0 * (a[:-1, :-1] + a[:-1,1:] + a[1:,:-1] + a[1:, 1:]).flatten()
@@ -106,8 +106,9 @@ def make_pw_hat_basis(div):
     
     return b
 
-def make_pw_hat_dict(div, width=1):
-    # Makes a complete hat basis for division div
+def make_pw_hat_dict(div, width=1, sparse=False):
+    # Makes a complete hat basis for division div. If sparse, each function only stores its width x width 
+    # patch of nodes (see PWLinearSqDyadicH1Patch), trimmed to the interior of the grid
     Vn = []
     # n is the number of internal grid points, i.e. we will have n different hat functionsdd
     # for our coarse-grid basis
@@ -115,8 +116,11 @@ def make_pw_hat_dict(div, width=1):
     
     for k in range(1,side_n,width):
         for l in range(1,side_n,width):
-            v = PWLinearSqDyadicH1(div=div)
-            v.values[k:k+width, l:l+width] = 1.0
+            if sparse:
+                v = PWLinearSqDyadicH1Patch(patch=np.ones([min(width, side_n-k), min(width, side_n-l)]), corner=(k,l), div=div)
+            else:
+                v = PWLinearSqDyadicH1(div=div)
+                v.values[k:k+width, l:l+width] = 1.0
             Vn.append(v)
     
     return Vn
@@ -8,11 +8,10 @@ Code to deal with piece-wise linear functions on triangulations - allows for tre
 """
 
 import math
+import collections
 import numpy as np
-import scipy.interpolate
 import scipy.linalg
 from scipy import sparse
-import copy
 
 import warnings
 
@@ -24,7 +23,34 @@ from mpl_toolkits.mplot3d import axes3d, Axes3D
 from pyApproxTools.vector import *
 from pyApproxTools.basis import *
 
-__all__ = ['PWSqDyadic', 'PWLinearSqDyadicH1', 'PWConstantSqDyadicL2']
+__all__ = ['PWSqDyadic', 'PWLinearSqDyadicH1', 'PWLinearSqDyadicH1Patch', 'PWConstantSqDyadicL2']
+
+def _prolong(vals, levels):
+    """ Exact refinement of the nodal values of a P1 function on the dyadic triangulation by levels levels. New 
+        nodes on the edges get the average of the edge's end points, and the diagonals run from [i, j+1] to [i+1, j] """
+    for l in range(levels):
+        n = vals.shape[0]
+        fine = np.empty((2 * n - 1, 2 * n - 1))
+        fine[::2, ::2] = vals
+        fine[::2, 1::2] = 0.5 * (vals[:, :-1] + vals[:, 1:])
+        fine[1::2, ::2] = 0.5 * (vals[:-1, :] + vals[1:, :])
+        fine[1::2, 1::2] = 0.5 * (vals[:-1, 1:] + vals[1:, :-1])
+        vals = fine
+    return vals
+
+def _restrict(vals, levels):
+    """ The adjoint of _prolong, which takes the dual (i.e. load vector) values of a fine function to the 
+        coarser grid, so that sum(c * _restrict(r, l)) = sum(_prolong(c, l) * r) """
+    for l in range(levels):
+        coarse = vals[::2, ::2].copy()
+        coarse[:, :-1] += 0.5 * vals[::2, 1::2]
+        coarse[:, 1:] += 0.5 * vals[::2, 1::2]
+        coarse[:-1, :] += 0.5 * vals[1::2, ::2]
+        coarse[1:, :] += 0.5 * vals[1::2, ::2]
+        coarse[:-1, 1:] += 0.5 * vals[1::2, 1::2]
+        coarse[1:, :-1] += 0.5 * vals[1::2, 1::2]
+        vals = coarse
+    return vals
 
 # TODO: Have intermediate PW linear vector definitions on arbitrary spaces...
 
@@ -32,6 +58,14 @@ __all__ = ['PWSqDyadic', 'PWLinearSqDyadicH1', 'PWConstantSqDyadicL2']
 
 class PWSqDyadic(Vector):
 
+    space = None
+
+    # How many copies of each function on other levels (refined or restricted) are kept
+    level_cache_size = 2
+
+    # Bumped whenever the values are set or changed in place, so that the level caches know when they are stale
+    _version = 0
+
     def __init__(self, values=None, div=None, func=None):
         
         # Do we really put these properties here? Hmm.
@@ -93,94 +127,192 @@ class PWSqDyadic(Vector):
             raise Exception("{0}: Error - values of shape {1}x{2} not square or don't match dimensions {3}x{3} (div {4})" .format(self.__class__.__name__, \
                             vals.shape[0], vals.shape[1], self.side_len, self.div))
         self._values = vals
+        self._version += 1
 
     def interpolate(self, interp_div):
         """ Simple interpolation routine to make this function on a finer division dyadic grid """
         pass 
 
-    # Here we overload the + += - -= * and / operators
-    def __add__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            return type(self)(u.values + v.values, d)
-        else:
-            return type(self)(self.values + other, self.div)
+    def restrict_dual(self, coarse_div):
+        """ The dual values of this function restricted to a coarser grid, which are what a function on that 
+            grid is summed against to get its dot product with this one. Inheritors keep them with 
+            _level_cached, so they are read only """
+        pass
+
+    def _level_cached(self, store, div, make):
+        """ A least recently used cache of the values array of this function on other levels, given by 
+            make(div). Every entry keeps the _version of the values it came from, which the values setter and
+            the in place operators bump, so writing straight into the values array (rather than setting it)
+            is not seen here. The arrays are shared between everyone who asks for them, so they are made read 
+            only, and functions wrapped around them copy them before changing them (see _own_values) """
+        cache = self.__dict__.setdefault(store, collections.OrderedDict())
+        if div in cache:
+            version, result = cache[div]
+            if version == self._version:
+                cache.move_to_end(div)
+                return result
+
+        result = make(div)
+        result.flags.writeable = False
+        cache[div] = (self._version, result)
+        while len(cache) > self.level_cache_size:
+            cache.popitem(last=False)
+        return result
 
-    __radd__ = __add__
+    def __getstate__(self):
+        """ Copies (deep copies and pickles) leave the level caches behind """
+        state = self.__dict__.copy()
+        state.pop('_refined', None)
+        state.pop('_restricted', None)
+        return state
+
+    def coarsen(self, coarse_div):
+        """ A cheap version of this function on a coarser division dyadic grid """
+        pass
+
+    def dot_features(self):
+        """ A flat array whose Euclidean dot products reproduce the dot product between functions of the 
+            same div, so that many dots can be done at once as a matrix product """
+        pass
+
+    @classmethod
+    def _trusted(cls, vals, div):
+        """ A function made straight from the values array, which is neither copied nor checked. Only for 
+            values already known to be valid, e.g. a linear combination of valid functions """
+        result = cls.__new__(cls)
+        result.d = 2
+        result.domain = ((0,1),(0,1))
+        result.space = cls.space
+        result.div = div
+        result._values = vals
+        return result
 
-    def __iadd__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
+    def _own_values(self):
+        """ Copy the values if they are a read only array shared with a level cache, before changing them """
+        if not self._values.flags.writeable:
+            self._values = self._values.copy()
+
+    def _is_function(self, other):
+        """ Whether other is a function on the same kind of grid, rather than a scalar or array """
+        return isinstance(other, PWSqDyadic) and other.space == self.space
+
+    def _operands(self, other):
+        """ The values of this and the other function (or scalar / array) on a common grid, and its div """
+        if self._is_function(other):
+            d = max(self.div, other.div)
+            return self.interpolate(d).values, other.interpolate(d).values, d
+        return self.values, other, self.div
+
+    def _apply(self, ufunc, other, out=None, trusted=True, reflected=False):
+        """ ufunc applied to the values of this and other, into a new function or into out if given. If the 
+            result isn't trusted to be valid it goes through the usual checks of _set_values """
+        u, v, d = self._operands(other)
+        if reflected:
+            u, v = v, u
+
+        if out is not None:
+            if not self._is_function(out) or out.div != d:
+                raise Exception('{0}: out must be a function of the same type with div {1}'.format(self.__class__.__name__, d))
+            out._own_values()
+            ufunc(u, v, out=out._values)
+            out._version += 1
+            if not trusted:
+                out.values = out._values
+            return out
+
+        if trusted:
+            return self._trusted(ufunc(u, v), d)
+        return type(self)(ufunc(u, v), d)
+
+    def _inplace(self, ufunc, other, trusted=True):
+        """ ufunc applied to the values of this and other, written over the values of this function where 
+            it can be, i.e. unless this function has to be refined or the result needs a wider dtype """
+        if not hasattr(self, '_values'):
+            # An empty function, e.g. the start of a sum in Basis.reconstruct, takes on the other's grid
+            self.div = other.div
+            self._values = np.zeros(other.values.shape)
+
+        if self._is_function(other) and other.div > self.div:
+            u, v, d = self._operands(other)
             self.div = d
-            self.values = u.values + v.values
+            self._values = ufunc(u, v)
         else:
-            self.values = self.values + other
+            v = other.interpolate(self.div).values if self._is_function(other) else other
+            self._own_values()
+            if np.can_cast(np.result_type(self._values, v), self._values.dtype):
+                ufunc(self._values, v, out=self._values)
+            else:
+                self._values = ufunc(self._values, v)
+        self._version += 1
+
+        if not trusted:
+            self.values = self._values
         return self
+
+    def add(self, other, out=None):
+        return self._apply(np.add, other, out=out, trusted=self._is_function(other))
+
+    def subtract(self, other, out=None):
+        return self._apply(np.subtract, other, out=out, trusted=self._is_function(other))
+
+    def multiply(self, other, out=None):
+        return self._apply(np.multiply, other, out=out)
+
+    def divide(self, other, out=None):
+        return self._apply(np.true_divide, other, out=out, trusted=not self._is_function(other))
+
+    def axpy(self, a, x):
+        """ self += a * x in place, without making a new function for a * x """
+        if not hasattr(self, '_values') or not self._is_function(x) or x.div > self.div:
+            return self._inplace(np.add, a * x)
+        v = x.interpolate(self.div).values
+        self._own_values()
+        if not np.can_cast(np.result_type(self._values, v, a), self._values.dtype):
+            self._values = self._values.astype(np.result_type(self._values, v, a))
+        self._values += a * v
+        self._version += 1
+        return self
+
+    # Here we overload the + += - -= * and / operators. Sums, differences and scalings of valid functions
+    # are valid, so skip the checks in _set_values, the rest go through them
+    def __add__(self, other):
+        return self.add(other)
+
+    __radd__ = __add__
+
+    def __iadd__(self, other):
+        return self._inplace(np.add, other, trusted=self._is_function(other))
         
     def __sub__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            return type(self)(u.values - v.values, d)
-        else:
-            return type(self)(self.values - other, self.div)
+        return self.subtract(other)
     
     def __rsub__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            return type(self)(v.values - u.values, d)
-        else:
-            return type(self)(other - self.values, self.div)
+        return self._apply(np.subtract, other, trusted=self._is_function(other), reflected=True)
 
     def __isub__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            self.div = d
-            self.values = u.values - v.values
-        else:
-            self.values = self.values - other
-        return self
+        return self._inplace(np.subtract, other, trusted=self._is_function(other))
 
     def __mul__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            return type(self)(u.values * v.values, d)
-        else:
-            return type(self)(self.values * other, self.div)
+        return self.multiply(other)
     __rmul__ = __mul__
 
+    def __imul__(self, other):
+        return self._inplace(np.multiply, other)
+
     def __pow__(self,power):
         return type(self)(self.values**power, self.div)
 
     def __truediv__(self, other):
-        if isinstance(other, type(self)):
-            d = max(self.div,other.div)
-            u = self.interpolate(d)
-            v = other.interpolate(d)
-            return type(self)(u.values / v.values, d)
-        else:
-            return type(self)(self.values / other, self.div)
+        return self.divide(other)
+
+    def __itruediv__(self, other):
+        return self._inplace(np.true_divide, other, trusted=not self._is_function(other))
 
     def __neg__(self):
-        result = copy.deepcopy(self)
-        result.values = -result.values
-        return result
+        return self._trusted(-self.values, self.div)
  
     def __pos__(self):
-        result = copy.deepcopy(self)
-        result.values = +result.values
-        return result
+        return self._trusted(+self.values, self.div)
 
 
 class PWLinearSqDyadicH1(PWSqDyadic):
@@ -188,6 +320,8 @@ class PWLinearSqDyadicH1(PWSqDyadic):
         Includes routines to calculate L2 and H1 dot products, and interpolate between different dyadic levels
         """
 
+    space = 'H1'
+
     def __init__(self, values = None, div = None, func = None):
 
         super().__init__(values, div, func)
@@ -201,29 +335,33 @@ class PWLinearSqDyadicH1(PWSqDyadic):
 
         if not np.allclose(self.values[:,0], 0) or not np.allclose(self.values[:,-1], 0) or not np.allclose(self.values[0,:], 0) or not np.allclose(self.values[-1,:], 0):
             warnings.warn("{0}: attempted to set some boundary values as non-zero, were forced to zero".format(self.__class__.__name__))
+        self._own_values()
         self.values[:,0] = self.values[:,-1] = self.values[0,:] = self.values[-1,:] = 0
 
     def dot(self, other):
+        Vector.n_dots += 1
         if isinstance(other, type(self)):
             if other.space == self.space:
-                if self.div == other.div:
-                    return self.H1_dot(other)
-                else:
-                    d = max(self.div,other.div)
-                    u = self.interpolate(d)
-                    v = other.interpolate(d)
-                    return u.H1_dot(v)
+                return self.H1_dot(other)
         else:
             # TODO: make this a warning rather than exception
             raise Exception('Dot product can only be between compatible dyadic functions')
     
     def H1_dot(self, other):
-        """ Compute the H1_0 dot product with another DyadicPWLinear function
-            automatically interpolates the coarser function """
+        """ Compute the H1_0 dot product with another DyadicPWLinear function. If the other function is on a 
+            different grid, the finer one is restricted to the coarser one (see restrict_dual) rather than 
+            the coarser one refined """
+        
+        if isinstance(other, PWLinearSqDyadicH1Patch) and other.patch is not None:
+            return other.H1_dot(self)
+
+        if self.div != other.div:
+            coarse, fine = (self, other) if self.div < other.div else (other, self)
+            return (coarse.values * fine.restrict_dual(coarse.div)).sum()
         
-        d = max(self.div,other.div)
-        u = self.interpolate(d).values
-        v = other.interpolate(d).values
+        d = self.div
+        u = self.values
+        v = other.values
 
         h = 2.0**(-d)
         n_side = 2**d
@@ -295,14 +433,67 @@ class PWLinearSqDyadicH1(PWSqDyadic):
         return h * h * dot / 12
 
     def interpolate(self, interp_div):
-        """ Simple interpolation routine to make this function on a finer division dyadic grid """
+        """ This function on a finer division dyadic grid, which is exact as the triangulations are nested. The 
+            last few refined values are kept (see _level_cached), and each call gets a new function around them """
         if interp_div < self.div:
             raise Exception("Interpolation division smaller than field division! Need to integrate")
         elif interp_div == self.div:
             return self
-        else:
-            interp_func = scipy.interpolate.interp2d(self.x_grid, self.y_grid, self.values, kind='linear')
-            return type(self)(interp_func(self._x_grid(self._side_len(interp_div)), self._y_grid(self._side_len(interp_div))), interp_div)
+        
+        return self._trusted(self._level_cached('_refined', interp_div, lambda d: _prolong(self.values, d - self.div)), interp_div)
+
+    def dual_values(self):
+        """ The stiffness matrix applied to the nodal values, A u, so that u.H1_dot(v) = sum(v.values * A u) """
+        u = self.values
+        n_side = 2**self.div
+        r = np.zeros(u.shape)
+
+        p = 2 * np.ones([n_side, n_side+1])
+        p[:,0] = p[:,-1] = 1
+        g = 0.5 * p * (u[:-1,:] - u[1:,:])
+        r[:-1,:] += g
+        r[1:,:] -= g
+        p = 2 * np.ones([n_side+1, n_side])
+        p[0,:] = p[-1,:] = 1
+        g = 0.5 * p * (u[:,1:] - u[:,:-1])
+        r[:,1:] += g
+        r[:,:-1] -= g
+
+        return r
+
+    def restrict_dual(self, coarse_div):
+        """ P^T A u, with P the prolongation from the coarse grid, as <c, u>_H1 = <P c, u>_H1 = c^T P^T A u. The 
+            array is kept (see _level_cached), so it is read only """
+        if coarse_div > self.div:
+            raise Exception('{0}: restriction div must be less than or equal to the function div'.format(self.__class__.__name__))
+        return self._level_cached('_restricted', coarse_div, lambda d: _restrict(self.dual_values(), self.div - d))
+
+    def _window(self, r0, r1, c0, c1):
+        """ The values on the block of nodes [r0:r1, c0:c1] """
+        return self.values[r0:r1, c0:c1]
+
+    def coarsen(self, coarse_div):
+        """ The nodal interpolant on the coarser grid, which is just every 2^(div - coarse_div)-th value """
+        if coarse_div > self.div:
+            raise Exception('{0}: coarsen div must be less than or equal to the function div'.format(self.__class__.__name__))
+        elif coarse_div == self.div:
+            return self
+        step = 2 ** (self.div - coarse_div)
+        return type(self)(self.values[::step, ::step], coarse_div)
+
+    def dot_features(self):
+        """ The weighted differences along each edge, as in H1_dot """
+        u = self.values
+        n_side = 2**self.div
+
+        p = 2 * np.ones([n_side, n_side+1])
+        p[:,0] = p[:,-1] = 1
+        f_y = np.sqrt(0.5 * p) * (u[:-1,:] - u[1:,:])
+        p = 2 * np.ones([n_side+1, n_side])
+        p[0,:] = p[-1,:] = 1
+        f_x = np.sqrt(0.5 * p) * (u[:,1:] - u[:,:-1])
+
+        return np.concatenate((f_y.ravel(), f_x.ravel()))
 
     def plot(self, ax, title=None, div_frame=4, alpha=0.5, cmap=cm.jet, show_axes_labels=True):
 
@@ -321,9 +512,132 @@ class PWLinearSqDyadicH1(PWSqDyadic):
         if title is not None:
             ax.set_title(title)
 
+class PWLinearSqDyadicH1Patch(PWLinearSqDyadicH1):
+    """ A PW linear function that is zero outside a small block of interior nodes, e.g. a hat function or 
+        a local measurement, stored as the corner node of the block and the values on it (the patch). Dots 
+        with other functions on the same grid only look at the patch and the nodes around it. The full grid 
+        of values is only made if something asks for values (e.g. changing them in place), after which the 
+        function is stored densely just like a PWLinearSqDyadicH1. 
+        """
+
+    patch = None
+
+    def __init__(self, values = None, div = None, func = None, patch = None, corner = None):
+
+        if patch is None:
+            super().__init__(values, div, func)
+            return
+        if values is not None or func is not None or div is None or corner is None:
+            raise Exception('{0}: Specify the patch, its corner and the div, and not the values or a function'.format(self.__class__.__name__))
+
+        self.d = 2
+        self.domain = ((0,1),(0,1))
+        self.space = 'H1'
+        self.div = div
+        self.patch = np.array(patch, dtype=float)
+        self.corner = tuple(corner)
+
+        if min(self.corner) < 1 or max(self.corner[0] + self.patch.shape[0], self.corner[1] + self.patch.shape[1]) > self.side_len - 1:
+            raise Exception('{0}: the patch must lie inside the interior nodes of the grid'.format(self.__class__.__name__))
+
+    @property
+    def values(self):
+        self._densify()
+        return self._values
+    @values.setter
+    def values(self, vals):
+        self.patch = None
+        self._set_values(vals)
+
+    def _densify(self):
+        """ Switch to storing the full grid of values """
+        if self.patch is not None:
+            self._values = self._dense()
+            self.patch = None
+
+    def _dense(self):
+        """ The full grid of values, without changing how this function is stored """
+        vals = np.zeros([self.side_len, self.side_len])
+        (i, j), (h, w) = self.corner, self.patch.shape
+        vals[i:i+h, j:j+w] = self.patch
+        return vals
+
+    def _as_dense(self):
+        if self.patch is None:
+            return self
+        return PWLinearSqDyadicH1._trusted(self._dense(), self.div)
+
+    def _window(self, r0, r1, c0, c1):
+        if self.patch is None:
+            return super()._window(r0, r1, c0, c1)
+        block = np.zeros([r1 - r0, c1 - c0])
+        (i, j), (h, w) = self.corner, self.patch.shape
+        a0, a1, b0, b1 = max(i, r0), min(i + h, r1), max(j, c0), min(j + w, c1)
+        if a0 < a1 and b0 < b1:
+            block[a0-r0:a1-r0, b0-c0:b1-c0] = self.patch[a0-i:a1-i, b0-j:b1-j]
+        return block
+
+    def dot(self, other):
+        if isinstance(other, PWLinearSqDyadicH1) and other.space == self.space:
+            Vector.n_dots += 1
+            return self.H1_dot(other)
+        raise Exception('Dot product can only be between compatible dyadic functions')
+
+    def H1_dot(self, other):
+        """ As the patch is on interior nodes, the stiffness matrix there is just the 5 point Laplacian, so 
+            the dot only needs the other function on the patch and a ring of nodes around it """
+        if self.patch is None or other.div != self.div:
+            return PWLinearSqDyadicH1.H1_dot(self._as_dense(), other)
+
+        (i, j), (h, w) = self.corner, self.patch.shape
+        u = other._window(i-1, i+h+1, j-1, j+w+1)
+        Au = 4 * u[1:-1,1:-1] - u[:-2,1:-1] - u[2:,1:-1] - u[1:-1,:-2] - u[1:-1,2:]
+        return (self.patch * Au).sum()
+
+    def _operands(self, other):
+        if self.patch is not None:
+            return self._as_dense()._operands(other)
+        return super()._operands(other)
+
+    def _inplace(self, ufunc, other, trusted=True):
+        self._densify()
+        return super()._inplace(ufunc, other, trusted)
+
+    def axpy(self, a, x):
+        self._densify()
+        return super().axpy(a, x)
+
+    def interpolate(self, interp_div):
+        if self.patch is not None and interp_div >= self.div:
+            return self._as_dense().interpolate(interp_div)
+        return super().interpolate(interp_div)
+
+    def restrict_dual(self, coarse_div):
+        return PWLinearSqDyadicH1.restrict_dual(self._as_dense(), coarse_div)
+
+    def coarsen(self, coarse_div):
+        if coarse_div == self.div:
+            return self
+        return self._as_dense().coarsen(coarse_div)
+
+    def dot_features(self):
+        return self._as_dense().dot_features()
+
+    def __neg__(self):
+        if self.patch is not None:
+            return type(self)(patch=-self.patch, corner=self.corner, div=self.div)
+        return super().__neg__()
+
+    def __pos__(self):
+        if self.patch is not None:
+            return type(self)(patch=+self.patch, corner=self.corner, div=self.div)
+        return super().__pos__()
+
 class PWConstantSqDyadicL2(PWSqDyadic):
     """ Describes a piecewise constant function on a dyadic P1 tringulation of the unit cube. """
     
+    space = 'L2'
+
     def __init__(self, values = None, div = None, func = None):
 
         super().__init__(values, div, func)
@@ -338,17 +652,18 @@ class PWConstantSqDyadicL2(PWSqDyadic):
         return np.linspace(self.domain[1][0], self.domain[1][1], sl, endpoint=False) + 0.5 / sl
 
     def dot(self, other):
+        Vector.n_dots += 1
         if isinstance(other, type(self)):
             return self.L2_dot(other)
         else:
             raise Exception('Dot product can only be between compatible dyadic functions')
 
     def L2_dot(self, other):
-        d = max(self.div, other.div)
-        u = self.interpolate(d)
-        v = other.interpolate(d)
+        if self.div != other.div:
+            coarse, fine = (self, other) if self.div < other.div else (other, self)
+            return (coarse.values * fine.restrict_dual(coarse.div)).sum()
 
-        return (u.values * v.values).sum() * 2**(-2 * d)
+        return (self.values * other.values).sum() * 2**(-2 * self.div)
 
     def interpolate(self, div):
         """ Simple interpolation routine to make this function on a finer division dyadic grid """
@@ -357,8 +672,38 @@ class PWConstantSqDyadicL2(PWSqDyadic):
         elif div == self.div:
             return self
         else:
-            return type(self)(values=self.values.repeat(2**(div-self.div), axis=0).repeat(2**(div-self.div), axis=1),
-                                    div=div)
+            return type(self)(values=self.cell_values(div), div=div)
+
+    def cell_values(self, div):
+        """ The value on each cell of the finer grid div. This is still a new array of the fine size, it only 
+            saves making (and checking) a function around it """
+        if div < self.div:
+            raise Exception("Interpolation division smaller than field division! Need to integrate")
+        idx = np.arange(2**div) // 2**(div - self.div)
+        return self.values[np.ix_(idx, idx)]
+
+    def restrict_dual(self, coarse_div):
+        """ The integral of this function over each cell of the coarser grid, as a read only array that is kept 
+            (see _level_cached) """
+        if coarse_div > self.div:
+            raise Exception('{0}: restriction div must be less than or equal to the field div'.format(self.__class__.__name__))
+        sl = 2**coarse_div
+        step = 2**(self.div - coarse_div)
+        return self._level_cached('_restricted', coarse_div, 
+                                  lambda d: self.values.reshape(sl, step, sl, step).sum(axis=(1,3)) * 2**(-2 * self.div))
+
+    def coarsen(self, coarse_div):
+        """ The L2 projection on to the coarser grid, i.e. the average over each block of cells """
+        if coarse_div > self.div:
+            raise Exception('{0}: coarsen div must be less than or equal to the field div'.format(self.__class__.__name__))
+        elif coarse_div == self.div:
+            return self
+        sl = 2**coarse_div
+        step = 2**(self.div - coarse_div)
+        return type(self)(values=self.values.reshape(sl, step, sl, step).mean(axis=(1,3)), div=coarse_div)
+
+    def dot_features(self):
+        return self.values.ravel() * 2**(-self.div)
 
     def plot(self, ax, title=None, alpha=0.5, cmap=cm.jet, show_axes_labels=True):
 
@@ -0,0 +1,122 @@
+"""
+shard.py
+
+Author: James Ashton Nichols
+Start date: June 2017
+
+A small process pool for running the dictionary scans of the greedy algorithms in parallel. The
+arrays with a row per dictionary element (measurements, cross-grammians, the active mask) live in
+shared memory, each worker looks after a contiguous block of rows (a shard), and at each step only
+the small broadcast vectors go through the pool, with the per-shard results reduced in the main process.
+"""
+
+import numpy as np
+import multiprocessing
+import weakref
+from multiprocessing import shared_memory, resource_tracker
+
+__all__ = ['ShardPool']
+
+# Shard boundaries are kept to multiples of this many rows, as BLAS treats the leftover rows of a block
+# differently, and we want every row to be computed exactly as it would be on the whole array
+_ROW_ALIGN = 64
+
+# The shared arrays a worker has attached to, by name
+_attached = {}
+
+def _attach(spec):
+    name, shape, dtype = spec
+    if name not in _attached:
+        # The workers share the resource tracker of the main process, which unlinks the blocks in close
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _attached[name][1]
+
+def _run_shard(kernel, specs, lo, hi, args):
+    arrays = {key: _attach(spec)[lo:hi] for key, spec in specs.items()}
+    return kernel(arrays, lo, *args)
+
+def _release(pool, blocks):
+    pool.terminate()
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+def local_best(crit, active, lo, largest=True):
+    """ The best active entry of a shard's criterion, as (value, global index), or None if there isn't one.
+        Kernels passed to ShardPool.best should return this """
+    if not active.any():
+        return None
+    if largest:
+        i = np.argmax(np.where(active, crit, -np.inf))
+    else:
+        i = np.argmin(np.where(active, crit, np.inf))
+    return crit[i], lo + i
+
+class ShardPool(object):
+    """ Arrays of N rows held in shared memory, split into contiguous shards of rows, and a process pool
+        that runs kernels on the shards. A kernel is a module level function kernel(arrays, lo, *args)
+        where arrays is a dict of the shard's rows of every shared array and lo is the shard's first row """
+
+    def __init__(self, N, processes=None, n_shards=None):
+
+        self.N = N
+        self.processes = processes or multiprocessing.cpu_count()
+        self.n_shards = n_shards or self.processes
+        self.bounds = (np.linspace(0, N, self.n_shards + 1) / _ROW_ALIGN).astype(int) * _ROW_ALIGN
+        self.bounds[-1] = N
+
+        self.arrays = {}
+        self._specs = {}
+        self._blocks = []
+        # Start the resource tracker before the workers, so that they share it with the main process
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(self.processes)
+
+        self._finalizer = weakref.finalize(self, _release, self.pool, self._blocks)
+
+    def share(self, key, a):
+        """ Put a (with N rows) in shared memory and return the shared copy, which the main process can
+            keep on using as a normal array. Sharing a key again copies into the existing block """
+        a = np.asarray(a)
+        if a.shape[0] != self.N:
+            raise Exception('ShardPool: shared arrays must have a row per dictionary element')
+
+        if key in self.arrays and self.arrays[key].shape == a.shape and self.arrays[key].dtype == a.dtype:
+            self.arrays[key][:] = a
+            return self.arrays[key]
+
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        self._blocks.append(shm)
+        self.arrays[key] = np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)
+        self.arrays[key][:] = a
+        self._specs[key] = (shm.name, a.shape, a.dtype.str)
+
+        return self.arrays[key]
+
+    def map(self, kernel, *args):
+        """ Run the kernel on every shard, returning the list of results in shard order """
+        tasks = [(kernel, self._specs, lo, hi, args) for lo, hi in zip(self.bounds[:-1], self.bounds[1:])]
+        return self.pool.starmap(_run_shard, tasks)
+
+    def best(self, kernel, *args, largest=True):
+        """ Reduce the (value, index) of the best entry of each shard (see local_best) to the overall
+            best, breaking ties with the lowest index just as np.argmax does. Returns (-1, None) if no
+            shard had an entry. """
+        best_i, best_val = -1, None
+        for res in self.map(kernel, *args):
+            if res is None:
+                continue
+            val, i = res
+            if best_val is None or (val > best_val if largest else val < best_val):
+                best_i, best_val = i, val
+        return best_i, best_val
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -12,7 +12,7 @@ import numpy as np
 from pyApproxTools.vector import *
 from pyApproxTools.basis import *
 
-__all__ = ['make_sin_basis', 'make_random_delta_basis', 'make_random_avg_basis', 'make_unif_avg_basis', 'make_unif_dictionary', 'make_rand_dictionary', 'make_unif_avg_dictionary']
+__all__ = ['make_sin_basis', 'make_random_delta_basis', 'make_random_avg_basis', 'make_unif_avg_basis', 'make_unif_dictionary', 'make_rand_dictionary', 'make_unif_avg_dictionary', 'MeasurementFamily']
 
 def make_sin_basis(n):
     V_n = []
@@ -102,6 +102,30 @@ def make_unif_avg_dictionary(N, epsilon):
 
     return dic
 
+class MeasurementFamily(object):
+    """ The continuous family of measurements that make_unif_dictionary (point evaluations, with no epsilon)
+        and make_unif_avg_dictionary (local averages of width epsilon) discretise, indexed by the location x 
+        of the point or the centre of the interval """
+
+    def __init__(self, epsilon=None):
+        self.epsilon = epsilon
+        if epsilon is None:
+            self.bounds = (0.0, 1.0)
+        else:
+            self.bounds = (0.5 * epsilon, 1.0 - 0.5 * epsilon)
+
+    def __call__(self, x):
+        if self.epsilon is None:
+            return FuncVector(params=[[x]],coeffs=[[1.0]],funcs=['H1UIDelta'])
+        return FuncVector(params=[[(x-0.5*self.epsilon, x+0.5*self.epsilon)]],coeffs=[[1.0]],funcs=['H1UIAvg'])
+
+    def location(self, v):
+        """ The location x of a measurement v of the family """
+        p = list(v.elements.values())[0].keys_array()[0]
+        if self.epsilon is None:
+            return float(p)
+        return 0.5 * (p[0] + p[1])
+
 def make_rand_dictionary(N):
 
     points = np.random.random(N)
@@ -125,6 +125,17 @@ class Element(object):
         """ These exact functions have mathematically defined dot products"""
         pass
 
+    def dots(self, right, left_params, right_params):
+        """ The dots with each of the right params separately, rather than their sum, as an array in the 
+            order of right_params. This is what lets a whole dictionary of one kind of element be dotted
+            in one go (see FuncVector.dots) """
+        return right._dots_with(self, left_params, right_params)
+
+    def _dots_with(self, left, left_params, right_params):
+        """ Elements that can do dots with many params at once overwrite this, otherwise we go through 
+            the right params one at a time """
+        return np.array([left.dot(self, left_params, AlgebraDict(float, [(p, c)])) for p, c in right_params.items()])
+
     def evaluate(self, params, x):
         """ This returns an array of len(params) * len(x), i.e. x is the 2nd coord,
             which is an important distinction between Element and Vector:
@@ -135,15 +146,16 @@ class Element(object):
     def _normaliser(self, params):
         pass
 
-    def _delta_dot(self, left, left_params, right_params):
-        """ Dotting with a delta function is always the same... """
+    def _delta_dot(self, left, left_params, right_params, axis=None):
+        """ Dotting with a delta function is always the same... axis=1 keeps the dots with each delta 
+            (the left params) apart, and axis=0 those with each of the right params """
         rc = right_params.values_array()
 
         x0 = left_params.keys_array()
         lc = left_params.values_array()[:,np.newaxis]
         ln = left._normaliser(left_params)[:,np.newaxis]
         
-        return (ln * lc * self.evaluate(right_params, x0)).sum()
+        return (ln * lc * self.evaluate(right_params, x0)).sum(axis=axis)
 
     def _avg_dot(self, right, left_params, right_params):
         # This is another one that the function should know about - how to do a
@@ -440,6 +452,10 @@ class H1UIDelta(H1UIElement):
     def _hat_dot(self, left, left_params, right_params):
         return left._delta_dot(self, right_params, left_params)
 
+    def _dots_with(self, left, left_params, right_params):
+        # Every element is dotted with a delta by evaluating it, which can be done at all the deltas at once
+        return left._delta_dot(self, right_params, left_params, axis=1)
+
     def _normaliser(self, params):
         p = params.keys_array()
         return 1. / np.sqrt((1. - p) * p)
@@ -474,7 +490,18 @@ class H1UIAvg(H1UIElement):
     def _avg_dot(self, right, left_params, right_params):
         return self._self_dot(left_params, right_params)
 
-    def _self_dot(self, left_params, right_params):
+    def _dots_with(self, left, left_params, right_params):
+        # The dots with the elements that dictionaries are dotted with most, i.e. sines, local averages and
+        # deltas, are kept apart for each right param by only summing over the left params
+        if isinstance(left, H1UIAvg):
+            return self._self_dot(left_params, right_params, axis=0)
+        if isinstance(left, H1UISin):
+            return self._sin_dot(left, left_params, right_params, axis=0)
+        if isinstance(left, H1UIDelta):
+            return self._delta_dot(left, left_params, right_params, axis=0)
+        return super()._dots_with(left, left_params, right_params)
+
+    def _self_dot(self, left_params, right_params, axis=None):
         a = left_params.keys_array()[:,0][:,np.newaxis]
         b = left_params.keys_array()[:,1][:,np.newaxis]
         lc = left_params.values_array()[:,np.newaxis]
@@ -504,7 +531,7 @@ class H1UIAvg(H1UIElement):
         dot += (~inq_1 & ~inq_2 & inq_3 & ~inq_4) * self._intr(c,d,a,b)
         dot += (~inq_1 & ~inq_2 & ~inq_3 & ~inq_4) * self._disj(c,d,a,b)
         
-        return (lc * ln * rc * rn * dot).sum()
+        return (lc * ln * rc * rn * dot).sum(axis=axis)
         
     # These internal functions represent the different cases for when the local avg is dotted against itself
     def _disj(self, a, b, c, d):
@@ -515,7 +542,7 @@ class H1UIAvg(H1UIElement):
         return (1.0/(b-a)) * ((1 - 0.5 * (c + d)) * 0.5 * (d*d - a*a) - (d - c)*(d - c) / 6.0 \
                 - 0.25 * (c + d) * ((1-b)*(1-b) - (1-d)*(1-d)))
 
-    def _sin_dot(self, left, left_params, right_params):
+    def _sin_dot(self, left, left_params, right_params, axis=None):
         # sin params
         m = left_params.keys_array()[:,np.newaxis]
         lc = left_params.values_array()[:,np.newaxis]
@@ -528,7 +555,7 @@ class H1UIAvg(H1UIElement):
         rn = self._normaliser(right_params)
          
         result = ln * rn * lc * rc * (np.cos(math.pi * m * a) - np.cos(math.pi * m * b)) / (math.pi * m * (b - a))
-        return result.sum()
+        return result.sum(axis=axis)
 
     def _affine_dot(self, left, left_params, right_params):
         # affine params
@@ -822,11 +849,25 @@ class Vector(object):
     
     # Ok new paradigm - use numpy to be a bit faster...
 
+    # A running count of the dot products computed, which is read by GreedyTrace
+    n_dots = 0
+
     def __init__(self):
         pass
 
     def dot(self, other):
         pass
+
+    def dots(self, others):
+        """ The dots of this vector with each of others, which inheritors can do in one go """
+        return np.array([self.dot(other) for other in others], dtype=float)
+
+    def axpy(self, a, x):
+        """ self += a * x, which inheritors can do in place without making a * x. Returns the result, 
+            which is self if it was done in place """
+        result = self
+        result += a * x
+        return result
     
     def norm(self):
         return math.sqrt(self.dot(self))
@@ -898,12 +939,37 @@ class FuncVector(Vector):
         return self.elements.values_array()[index].values_array()
     
     def dot(self, other):
+        Vector.n_dots += 1
         dot = 0.0
         for l in self.elements:
             for r in other.elements:
                 dot += l.dot(r, self.elements[l], other.elements[r])
         return dot
 
+    def dots(self, others):
+        """ The dots with each of others. Those that are a single param of a single element, e.g. the 
+            dictionaries of make_unif_dictionary and make_unif_avg_dictionary, are grouped by element and 
+            done with one Element.dots per group, against each distinct param with a unit coefficient """
+        dots = np.zeros(len(others))
+        groups = collections.defaultdict(list)
+        for j, other in enumerate(others):
+            if isinstance(other, FuncVector) and len(other.elements) == 1:
+                r, params = next(iter(other.elements.items()))
+                if len(params) == 1:
+                    groups[r].append(j)
+                    continue
+            dots[j] = self.dot(other)
+
+        for r, idx in groups.items():
+            p, c = zip(*(next(iter(others[j].elements[r].items())) for j in idx))
+            unit = AlgebraDict(float, [(q, 1.0) for q in p])
+            pos = {q: i for i, q in enumerate(unit)}
+            unit_dots = sum((l.dots(r, self.elements[l], unit) for l in self.elements), np.zeros(len(unit)))
+            dots[idx] = np.array(c) * unit_dots[[pos[q] for q in p]]
+            Vector.n_dots += len(idx)
+
+        return dots
+
     def evaluate(self, x):
         ev = 0.0
         for el in self.elements:
@@ -920,6 +986,13 @@ class FuncVector(Vector):
     def __iadd__(self, other):
         self.elements += other.elements
         return self 
+
+    def axpy(self, a, x):
+        """ self += a * x in place, adding to the coefficients directly rather than copying x to scale it """
+        for el, params in x.elements.items():
+            for p, c in params.items():
+                self.elements[el][p] += a * c
+        return self
      
     def __sub__(self, other):
         result = copy.deepcopy(self)
@@ -31,13 +31,22 @@ ms_wcomp = np.zeros((len(ns),2), dtype=np.int16)
 
 Vn = pat.make_sin_basis(ns[-1])
 
+# If the job dies we pick up again from the last checkpoint of each construction
+os.makedirs('checkpoints', exist_ok=True)
+
 for j, n in enumerate(ns):
     
+    comp_checkpoint = 'checkpoints/01_comp_{0}.npz'.format(n)
     gbc = pat.CollectiveOMP(dictionary, Vn.subspace(slice(0,n)), verbose=True)
-    Wm_comp = gbc.construct_to_beta(beta_star)
+    if os.path.isfile(comp_checkpoint):
+        gbc.load_checkpoint(comp_checkpoint)
+    Wm_comp = gbc.construct_to_beta(beta_star, checkpoint=comp_checkpoint, checkpoint_every=10)
     
+    wcomp_checkpoint = 'checkpoints/01_wcomp_{0}.npz'.format(n)
     wcgbc = pat.WorstCaseOMP(dictionary, Vn.subspace(slice(0,n)), verbose=True)
-    Wm_wcomp = wcgbc.construct_to_beta(beta_star)
+    if os.path.isfile(wcomp_checkpoint):
+        wcgbc.load_checkpoint(wcomp_checkpoint)
+    Wm_wcomp = wcgbc.construct_to_beta(beta_star, checkpoint=wcomp_checkpoint, checkpoint_every=10)
 
     ms_comp[j,0] = n
     ms_comp[j,1] = Wm_comp.n
@@ -43,12 +43,12 @@ ms_wcomp[0,1] = wcgbc.m
 
 for j, n in enumerate(ns[1:]):
     
-    cgbc.Vn = Vn.subspace(slice(0,n))
+    cgbc.extend_Vn(Vn.subspace(slice(0,n)))
     Wm_comp = cgbc.construct_to_beta(beta_star)
     ms_comp[j,0] = n
     ms_comp[j,1] = cgbc.m
     
-    wcgbc.Vn = Vn.subspace(slice(0,n))
+    wcgbc.extend_Vn(Vn.subspace(slice(0,n)))
     Wm_wcomp = wcgbc.construct_to_beta(beta_star)
     ms_wcomp[j,0] = n 
     ms_wcomp[j,1] = wcgbc.m